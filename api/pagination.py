@@ -0,0 +1,64 @@
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from posts.paginator import CURSOR_PARAM, CursorPaginator
+
+
+class KeysetPagination(BasePagination):
+    """Курсорная пагинация API на том же движке, что и ленты сайта.
+
+    Порядок задаётся атрибутом ``cursor_ordering`` у view, по умолчанию
+    (-pub_date, -id). COUNT(*) не выполняется.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'limit'
+    ordering = ('-pub_date', '-id')
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        paginator = CursorPaginator(
+            queryset, self.get_page_size(request),
+            ordering=getattr(view, 'cursor_ordering', self.ordering),
+        )
+        return self.paginate_page(
+            paginator.get_page(request.query_params.get(CURSOR_PARAM)),
+            request,
+        )
+
+    def paginate_page(self, page, request):
+        """Принимает готовую CursorPage, например ленту подписок."""
+        self.page = page
+        self.request = request
+        return list(page)
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), CURSOR_PARAM, cursor
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self._link(self.page.next_cursor),
+            'previous': self._link(self.page.previous_cursor),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,159 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.serializers import FollowSerializer
+from posts.models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='apiauthor', password='pass-12345'
+        )
+        cls.reader = User.objects.create_user(username='apireader')
+        cls.group = Group.objects.create(
+            title='API', slug='api', description='Группа API'
+        )
+        for count in range(25):
+            Post.objects.create(
+                author=cls.author, text=f'Пост {count}', group=cls.group
+            )
+        cls.post = Post.objects.first()
+
+    def setUp(self):
+        cache.clear()
+        self.guest = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def test_posts_cursor_pagination(self):
+        response = self.guest.get('/api/v1/posts/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['results']), 20)
+        self.assertIsNone(data['previous'])
+        second = self.guest.get(data['next']).json()
+        self.assertEqual(len(second['results']), 5)
+        self.assertIsNone(second['next'])
+        ids = [post['id'] for post in data['results'] + second['results']]
+        self.assertEqual(
+            ids,
+            list(Post.objects.order_by('-pub_date', '-id')
+                 .values_list('id', flat=True))
+        )
+
+    def test_posts_constant_queries(self):
+        with self.assertNumQueries(1):
+            self.guest.get('/api/v1/posts/?limit=3')
+        with self.assertNumQueries(1):
+            self.guest.get('/api/v1/posts/?limit=25')
+
+    def test_sparse_fields(self):
+        data = self.guest.get('/api/v1/posts/?fields=id,text').json()
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+
+    def test_post_payload(self):
+        data = self.guest.get(f'/api/v1/posts/{self.post.id}/').json()
+        self.assertEqual(data['author'], 'apiauthor')
+        self.assertEqual(data['group'], 'api')
+
+    def test_create_and_edit_permissions(self):
+        response = self.guest.post('/api/v1/posts/', {'text': 'Гость'})
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post(
+            '/api/v1/posts/', {'text': 'Читатель', 'group': 'api'}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Post.objects.filter(
+            author=self.reader, text='Читатель', group=self.group
+        ).exists())
+        response = self.client.patch(
+            f'/api/v1/posts/{self.post.id}/', {'text': 'Чужой'}
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_jwt(self):
+        response = self.guest.post(
+            '/api/v1/jwt/create/',
+            {'username': 'apiauthor', 'password': 'pass-12345'}
+        )
+        self.assertEqual(response.status_code, 200)
+        token = response.json()['access']
+        self.guest.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        response = self.guest.post('/api/v1/posts/', {'text': 'С токеном'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['author'], 'apiauthor')
+
+    def test_comments(self):
+        url = f'/api/v1/posts/{self.post.id}/comments/'
+        response = self.client.post(url, {'text': 'Первый'})
+        self.assertEqual(response.status_code, 201)
+        self.client.post(url, {'text': 'Второй'})
+        with self.assertNumQueries(2):
+            data = self.guest.get(url).json()
+        self.assertEqual(
+            [comment['text'] for comment in data['results']],
+            ['Первый', 'Второй']
+        )
+        self.assertEqual(data['results'][0]['author'], 'apireader')
+        self.assertEqual(Comment.objects.filter(post=self.post).count(), 2)
+        self.assertEqual(
+            self.guest.get('/api/v1/posts/0/comments/').status_code, 404
+        )
+
+    def test_follow_and_feed(self):
+        self.assertEqual(
+            self.client.post('/api/v1/follow/', {'author': 'apireader'})
+            .status_code, 400
+        )
+        response = self.client.post('/api/v1/follow/', {'author': 'apiauthor'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            self.client.post('/api/v1/follow/', {'author': 'apiauthor'})
+            .status_code, 400
+        )
+        follows = self.client.get('/api/v1/follow/').json()['results']
+        self.assertEqual(
+            follows, [{'user': 'apireader', 'author': 'apiauthor'}]
+        )
+
+        feed = self.client.get('/api/v1/feed/?limit=10').json()
+        self.assertEqual(len(feed['results']), 10)
+        self.assertEqual(feed['results'][0]['author'], 'apiauthor')
+        self.assertIsNotNone(feed['next'])
+
+        response = self.client.delete('/api/v1/follow/apiauthor/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(
+            Follow.objects.filter(user=self.reader, author=self.author)
+            .exists()
+        )
+        self.assertEqual(
+            self.client.get('/api/v1/feed/').json()['results'], []
+        )
+
+    def test_follow_race_is_a_bad_request(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        # Валидатор уникальности проверил пару до того, как соседний
+        # запрос успел её записать.
+        with mock.patch.object(
+            FollowSerializer, 'get_validators', return_value=[]
+        ):
+            response = self.client.post(
+                '/api/v1/follow/', {'author': 'apiauthor'}
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).follower_count, 1
+        )
+
+    def test_feed_requires_auth(self):
+        self.assertEqual(self.guest.get('/api/v1/feed/').status_code, 401)
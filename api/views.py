@@ -0,0 +1,110 @@
+from django.shortcuts import get_object_or_404
+from rest_framework import (
+    generics, mixins, permissions, serializers, viewsets
+)
+
+from api.permissions import IsAuthorOrReadOnly
+from api.serializers import (
+    CommentSerializer, FollowSerializer, GroupSerializer, PostSerializer
+)
+from posts import follows
+from posts.models import Follow, Group, Post
+from posts.thumbnails import schedule_post
+from posts.timeline import get_timeline_page
+
+
+class PostViewSet(viewsets.ModelViewSet):
+    """Посты; ``?group=<slug>`` и ``?author=<username>`` сужают ленту."""
+    serializer_class = PostSerializer
+    permission_classes = (
+        permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly
+    )
+
+    def get_queryset(self):
+        queryset = Post.objects.for_feed()
+        group = self.request.query_params.get('group')
+        if group:
+            queryset = queryset.filter(group__slug=group)
+        author = self.request.query_params.get('author')
+        if author:
+            queryset = queryset.filter(author__username=author)
+        return queryset
+
+    def perform_create(self, serializer):
+        schedule_post(serializer.save(author=self.request.user))
+
+    def perform_update(self, serializer):
+        post = serializer.save()
+        if 'image' in serializer.validated_data:
+            schedule_post(post)
+
+
+class GroupViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Group.objects.all()
+    serializer_class = GroupSerializer
+    cursor_ordering = ('id',)
+
+
+class CommentViewSet(viewsets.ModelViewSet):
+    serializer_class = CommentSerializer
+    permission_classes = (
+        permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly
+    )
+    cursor_ordering = ('created', 'id')
+
+    def get_post(self):
+        if not hasattr(self, '_post'):
+            self._post = get_object_or_404(
+                Post.objects.only('id'), pk=self.kwargs['post_id']
+            )
+        return self._post
+
+    def get_queryset(self):
+        return self.get_post().comments.select_related('author')
+
+    def perform_create(self, serializer):
+        serializer.save(author=self.request.user, post=self.get_post())
+
+
+class FollowViewSet(mixins.ListModelMixin, mixins.CreateModelMixin,
+                    mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """Подписки текущего пользователя; отписка — DELETE /follow/<username>/."""
+    serializer_class = FollowSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    lookup_field = 'author__username'
+    lookup_url_kwarg = 'username'
+    cursor_ordering = ('-id',)
+
+    def get_queryset(self):
+        return self.request.user.follower.select_related('user', 'author')
+
+    def perform_create(self, serializer):
+        # Валидатор уникальности не спасает от параллельного запроса:
+        # пишем через posts.follows, а дубль превращаем в 400, не в 500.
+        author = serializer.validated_data['author']
+        if not follows.follow(self.request.user, author):
+            raise serializers.ValidationError(
+                {'non_field_errors': ['Вы уже подписаны на этого автора']}
+            )
+        serializer.instance = Follow.objects.select_related(
+            'user', 'author'
+        ).get(user=self.request.user, author=author)
+
+    def perform_destroy(self, instance):
+        follows.unfollow(instance.user, instance.author)
+
+
+class FeedView(generics.GenericAPIView):
+    """Лента подписок: те же TimelineEntry, что и на странице /follow/."""
+    serializer_class = PostSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request):
+        page = self.paginator.paginate_page(
+            get_timeline_page(
+                request, request.user, self.paginator.get_page_size(request)
+            ),
+            request,
+        )
+        serializer = self.get_serializer(page, many=True)
+        return self.paginator.get_paginated_response(serializer.data)
@@ -0,0 +1,228 @@
+"""Метрики запросов: время, SQL, шаблоны и кэш.
+
+Данные текущего запроса лежат в contextvar, поэтому их видят и потоки
+sync_to_async, в которых асинхронные view ходят в базу. Перехватчики
+ставятся один раз и только при включённых метриках (METRICS_ENABLED);
+вне запроса они ничего не делают.
+
+Гистограммы копятся в памяти процесса: каждый воркер отдаёт свои.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.template.base import Template
+
+from core import queries
+
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+_current = ContextVar('request_metrics', default=None)
+_MISSING = object()
+_installed = False
+_install_lock = threading.Lock()
+
+
+class RequestMetrics:
+    __slots__ = (
+        'started', 'queries', 'db_time', 'template_time', 'template_depth',
+        'cache_hits', 'cache_misses',
+    )
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def on_query(self, sql, duration):
+        self.queries += 1
+        self.db_time += duration
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        return ', '.join((
+            f'app;dur={total * 1000:.1f}',
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+        ))
+
+
+def start():
+    metrics = RequestMetrics()
+    return metrics, (_current.set(metrics), queries.push(metrics.on_query))
+
+
+def finish(tokens):
+    metrics_token, queries_token = tokens
+    queries.pop(queries_token)
+    _current.reset(metrics_token)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+
+class Registry:
+    """Гистограммы и счётчики по имени URL (posts:profile и т. п.)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def _view(self, name):
+        if name not in self.views:
+            self.views[name] = {
+                'duration': Histogram(DURATION_BUCKETS),
+                'queries': Histogram(QUERY_BUCKETS),
+                'db_seconds': 0.0,
+                'template_seconds': 0.0,
+                'cache_hits': 0,
+                'cache_misses': 0,
+            }
+        return self.views[name]
+
+    def observe(self, name, metrics, total):
+        with self.lock:
+            view = self._view(name)
+            view['duration'].observe(total)
+            view['queries'].observe(metrics.queries)
+            view['db_seconds'] += metrics.db_time
+            view['template_seconds'] += metrics.template_time
+            view['cache_hits'] += metrics.cache_hits
+            view['cache_misses'] += metrics.cache_misses
+
+    def clear(self):
+        with self.lock:
+            self.views.clear()
+
+    def _histogram(self, lines, metric, view, histogram):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(
+                f'{metric}_bucket{{view="{view}",le="{bound}"}} {cumulative}'
+            )
+        cumulative += histogram.counts[-1]
+        lines.append(
+            f'{metric}_bucket{{view="{view}",le="+Inf"}} {cumulative}'
+        )
+        lines.append(f'{metric}_sum{{view="{view}"}} {histogram.total}')
+        lines.append(f'{metric}_count{{view="{view}"}} {cumulative}')
+
+    def prometheus(self):
+        """Текстовый формат экспозиции Prometheus 0.0.4."""
+        families = (
+            ('yatube_request_duration_seconds', 'histogram',
+             'Время обработки запроса', 'duration'),
+            ('yatube_request_db_queries', 'histogram',
+             'SQL-запросов на один HTTP-запрос', 'queries'),
+            ('yatube_db_seconds_total', 'counter',
+             'Время в базе данных', 'db_seconds'),
+            ('yatube_template_seconds_total', 'counter',
+             'Время рендера шаблонов', 'template_seconds'),
+            ('yatube_cache_hits_total', 'counter',
+             'Попадания в кэш', 'cache_hits'),
+            ('yatube_cache_misses_total', 'counter',
+             'Промахи кэша', 'cache_misses'),
+        )
+        with self.lock:
+            lines = []
+            for metric, kind, description, key in families:
+                lines.append(f'# HELP {metric} {description}')
+                lines.append(f'# TYPE {metric} {kind}')
+                for view, values in sorted(self.views.items()):
+                    if kind == 'histogram':
+                        self._histogram(lines, metric, view, values[key])
+                    else:
+                        lines.append(
+                            f'{metric}{{view="{view}"}} {values[key]}'
+                        )
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def _patch_templates():
+    original = Template._render
+
+    def _render(self, context):
+        metrics = _current.get()
+        if metrics is None:
+            return original(self, context)
+        # Вложенные {% include %} считаются внутри внешнего шаблона.
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_time += time.perf_counter() - started
+
+    Template._render = _render
+
+
+def _patch_cache(backend_class):
+    original_get = backend_class.get
+
+    def get(self, key, default=None, version=None):
+        value = original_get(self, key, _MISSING, version=version)
+        metrics = _current.get()
+        if metrics is not None:
+            if value is _MISSING:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return default if value is _MISSING else value
+
+    backend_class.get = get
+    # Базовый get_many сам зовёт get, своя реализация — нет.
+    if backend_class.get_many is BaseCache.get_many:
+        return
+    original_get_many = backend_class.get_many
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = original_get_many(self, keys, version=version)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.cache_hits += len(found)
+            metrics.cache_misses += len(keys) - len(found)
+        return found
+
+    backend_class.get_many = get_many
+
+
+def install():
+    """Ставит перехватчики SQL, шаблонов и кэша (один раз на процесс)."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        queries.install()
+        _patch_templates()
+        for backend_class in {type(caches[alias]) for alias in caches}:
+            _patch_cache(backend_class)
+        _installed = True
@@ -0,0 +1,95 @@
+import asyncio
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core import metrics, queries
+
+
+class MetricsMiddleware:
+    """Замеры запроса, заголовок Server-Timing и гистограммы по URL.
+
+    При выключенных метриках Django выбрасывает middleware из цепочки,
+    и запросы идут без накладных расходов.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        metrics.install()
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        current, token = metrics.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish(token)
+        return self.record(request, response, current)
+
+    async def __acall__(self, request):
+        current, token = metrics.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish(token)
+        return self.record(request, response, current)
+
+    def record(self, request, response, current):
+        total = current.elapsed()
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else '<unresolved>'
+        metrics.registry.observe(view, current, total)
+        response['Server-Timing'] = current.server_timing(total)
+        return response
+
+
+class QueryInspectionMiddleware:
+    """Пишет в лог N+1 и медленные запросы каждого HTTP-запроса.
+
+    Форма запроса, повторённая QUERY_REPEAT_THRESHOLD раз и больше, и
+    запросы дольше SLOW_QUERY_MS попадают в лог core.queries.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_INSPECTION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = settings.QUERY_REPEAT_THRESHOLD
+        self.slow_ms = settings.SLOW_QUERY_MS
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        with queries.inspect_queries() as log:
+            response = self.get_response(request)
+        self.report(request, log)
+        return response
+
+    async def __acall__(self, request):
+        with queries.inspect_queries() as log:
+            response = await self.get_response(request)
+        self.report(request, log)
+        return response
+
+    def report(self, request, log):
+        for shape, count in log.repeated(self.threshold):
+            queries.logger.warning(
+                'Возможный N+1 на %s: %d одинаковых запросов: %s',
+                request.path, count, shape
+            )
+        for duration, sql in log.slow(self.slow_ms):
+            queries.logger.warning(
+                'Медленный запрос на %s (%.1f мс): %s',
+                request.path, duration, sql
+            )
@@ -0,0 +1,167 @@
+"""Разбор SQL-запросов: N+1, медленные запросы и бюджеты в тестах.
+
+Запросы группируются по «форме» — тексту без литералов и с
+IN-списками любой длины, схлопнутыми в один. Одна форма, повторённая
+много раз за запрос, — почти всегда N+1 из шаблона или цикла.
+
+Наблюдатели (callback(sql, duration)) подписываются через contextvar,
+поэтому видят и запросы, которые асинхронные view выполняют в потоках
+sync_to_async. Перехват курсора ставится при первой подписке.
+"""
+import functools
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ContextDecorator, contextmanager
+from contextvars import ContextVar
+
+from django.db.backends.utils import CursorWrapper
+
+
+logger = logging.getLogger(__name__)
+
+_observers = ContextVar('query_observers', default=())
+_installed = False
+_install_lock = threading.Lock()
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)', re.IGNORECASE)
+_VALUES = re.compile(r'(\([^()]*\))(?:, \1)+')
+_SPACE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """Форма запроса: без литералов, IN-списков и повторов VALUES."""
+    sql = _SPACE.sub(' ', sql).strip()
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _VALUES.sub(r'\1, ...', sql)
+
+
+def install():
+    """Перехватывает выполнение запросов во всех соединениях."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        original = CursorWrapper._execute_with_wrappers
+
+        def timed(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                duration = time.perf_counter() - started
+                for callback in _observers.get():
+                    callback(sql, duration)
+
+        def _execute_with_wrappers(self, sql, params, many, executor):
+            if _observers.get():
+                executor = functools.partial(timed, executor)
+            return original(self, sql, params, many, executor)
+
+        CursorWrapper._execute_with_wrappers = _execute_with_wrappers
+        _installed = True
+
+
+def push(callback):
+    install()
+    return _observers.set(_observers.get() + (callback,))
+
+
+def pop(token):
+    _observers.reset(token)
+
+
+@contextmanager
+def observe(callback):
+    token = push(callback)
+    try:
+        yield callback
+    finally:
+        pop(token)
+
+
+class QueryLog:
+    """Запросы, выполненные внутри observe(): текст и время."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, sql, duration):
+        self.queries.append((sql, duration))
+
+    def __len__(self):
+        return len(self.queries)
+
+    def shapes(self):
+        return Counter(normalize(sql) for sql, _ in self.queries)
+
+    def repeated(self, threshold):
+        """Формы, выполненные не меньше threshold раз."""
+        return [
+            (shape, count) for shape, count in self.shapes().most_common()
+            if count >= threshold
+        ]
+
+    def slow(self, limit_ms):
+        return [
+            (duration * 1000, sql) for sql, duration in self.queries
+            if duration * 1000 >= limit_ms
+        ]
+
+    def report(self):
+        return '\n'.join(
+            f'{count:>4} × {shape}'
+            for shape, count in self.shapes().most_common()
+        )
+
+
+def inspect_queries():
+    return observe(QueryLog())
+
+
+class query_budget(ContextDecorator):
+    """Падает, если код выполнил больше запросов, чем разрешено.
+
+    ``max_queries`` — всего запросов, ``max_repeats`` — сколько раз
+    может повториться одна форма. Работает и как декоратор теста::
+
+        @query_budget(5, max_repeats=1)
+        def test_post_detail(self):
+            ...
+    """
+
+    def __init__(self, max_queries=None, max_repeats=None):
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+
+    def __enter__(self):
+        self.log = QueryLog()
+        self.token = push(self.log)
+        return self.log
+
+    def __exit__(self, exc_type, exc, traceback):
+        pop(self.token)
+        if exc_type is not None:
+            return False
+        problems = []
+        if self.max_queries is not None and len(self.log) > self.max_queries:
+            problems.append(
+                f'{len(self.log)} запросов при бюджете {self.max_queries}'
+            )
+        if self.max_repeats is not None:
+            problems.extend(
+                f'форма повторилась {count} раз (можно {self.max_repeats}): '
+                f'{shape}'
+                for shape, count in self.log.repeated(self.max_repeats + 1)
+            )
+        if problems:
+            raise AssertionError(
+                '\n'.join(problems) + '\n\nВсе запросы:\n' + self.log.report()
+            )
+        return False
@@ -0,0 +1,61 @@
+"""Окружение тестов: свои настройки поверх рабочих.
+
+Применяются только раннером тестов (TEST_RUNNER для manage.py test,
+фикстура в tests/conftest.py для pytest), а не по имени запущенной
+программы.
+"""
+import os
+import shutil
+import tempfile
+
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+TEST_SETTINGS = {
+    # cache.clear() в тестах не должен чистить общий кэш разработчика.
+    'CACHES': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'yatube-tests',
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        }
+    },
+    # Данные TestCase живут в незакоммиченной транзакции основного
+    # потока, поэтому асинхронные view читают из него же. Рабочий путь
+    # через пул проверяют TransactionTestCase с False.
+    'ASYNC_READS_THREAD_SENSITIVE': True,
+}
+
+
+def test_overrides():
+    return override_settings(**TEST_SETTINGS)
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.overrides = test_overrides()
+        self.overrides.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.overrides.disable()
+        super().teardown_test_environment(**kwargs)
+
+    def setup_databases(self, **kwargs):
+        # SQLite в памяти не пускает запись из других потоков, а пул
+        # чтений и тесты гонок работают именно из них: тестовая база
+        # SQLite — файл во временном каталоге.
+        self.database_dir = tempfile.mkdtemp(prefix='yatube-tests-')
+        for connection in connections.all():
+            test = connection.settings_dict['TEST']
+            if connection.vendor == 'sqlite' and not test['NAME']:
+                test['NAME'] = os.path.join(
+                    self.database_dir, f'{connection.alias}.sqlite3'
+                )
+        return super().setup_databases(**kwargs)
+
+    def teardown_databases(self, old_config, **kwargs):
+        super().teardown_databases(old_config, **kwargs)
+        shutil.rmtree(self.database_dir, ignore_errors=True)
@@ -1,6 +1,139 @@
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncClient, Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.metrics import registry
+from core.queries import inspect_queries, normalize, query_budget
+from posts.models import Post
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
     def test_error_page(self):
         response = self.client.get('/nonexist-page/')
+
+
+@override_settings(METRICS_ENABLED=True)
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='metricsuser')
+        cls.post = Post.objects.create(author=cls.user, text='Замер')
+
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+        self.client = Client()
+
+    def test_server_timing_header(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        timing = dict(
+            part.strip().split(';', 1)
+            for part in response['Server-Timing'].split(',')
+        )
+        self.assertEqual(set(timing), {'app', 'db', 'tpl', 'cache'})
+        self.assertIn(f'desc="{len(captured)} queries"', timing['db'])
+        self.assertNotIn('hit=0 miss=0', timing['cache'])
+        self.assertNotEqual(timing['tpl'], 'dur=0.0')
+
+    def test_prometheus_histograms(self):
+        self.client.get(reverse('posts:posts_list'))
+        self.client.get(reverse('posts:posts_list'))
+        self.client.get(reverse('posts:post_detail', args=[self.post.id]))
+        response = self.client.get('/metrics/', REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:posts_list"} 2',
+            body
+        )
+        self.assertIn(
+            'yatube_request_db_queries_count{view="posts:post_detail"} 1',
+            body
+        )
+        self.assertIn('# TYPE yatube_cache_hits_total counter', body)
+
+    async def test_async_request(self):
+        # Запросы асинхронных view идут в потоках sync_to_async.
+        response = await AsyncClient().get(reverse('posts:posts_list'))
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+    def test_metrics_endpoint_is_internal(self):
+        response = self.client.get('/metrics/', REMOTE_ADDR='10.1.2.3')
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        response = Client().get(reverse('posts:posts_list'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(
+            Client().get('/metrics/', REMOTE_ADDR='127.0.0.1').status_code,
+            404
+        )
+
+
+class QueryInspectionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='inspecteduser')
+        for count in range(6):
+            Post.objects.create(author=cls.user, text=f'Пост {count}')
+
+    def test_normalize(self):
+        self.assertEqual(
+            normalize("SELECT  a FROM t WHERE id IN (%s, %s, %s) "
+                      "AND name = 'x' LIMIT 21"),
+            'SELECT a FROM t WHERE id IN (...) AND name = ? LIMIT ?'
+        )
+        self.assertEqual(
+            normalize('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)'),
+            'INSERT INTO t (a, b) VALUES (%s, %s), ...'
+        )
+
+    def test_repeated_shapes(self):
+        with inspect_queries() as log:
+            for post in Post.objects.all():
+                post.author.username
+        self.assertEqual(len(log), 7)
+        [(shape, count)] = log.repeated(5)
+        self.assertEqual(count, 6)
+        self.assertIn('auth_user', shape)
+
+    def test_budget(self):
+        with query_budget(1):
+            list(Post.objects.select_related('author'))
+        with self.assertRaisesMessage(AssertionError, '2 запросов'):
+            with query_budget(1):
+                Post.objects.count()
+                Post.objects.count()
+        with self.assertRaisesMessage(AssertionError, 'повторилась'):
+            with query_budget(max_repeats=1):
+                for post in Post.objects.all()[:2]:
+                    post.author.username
+
+    @override_settings(QUERY_INSPECTION=True, QUERY_REPEAT_THRESHOLD=3,
+                       SLOW_QUERY_MS=0)
+    def test_middleware_logs(self):
+        cache.clear()
+        with self.assertLogs('core.queries', 'WARNING') as logs:
+            Client().get(reverse('posts:posts_list'))
+        self.assertTrue(
+            any('Медленный запрос на /' in line for line in logs.output)
+        )
+
+
+class TestRunnerTests(TestCase):
+    def test_tests_use_private_cache(self):
+        self.assertEqual(
+            settings.CACHES['default']['BACKEND'],
+            'django.core.cache.backends.locmem.LocMemCache'
+        )
@@ -1,5 +1,9 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from core.metrics import registry
+
 
 def page_not_found(request, exception):
     return render(
@@ -20,3 +24,15 @@ def csrf_failure(request, reason=''):
 
 def server_error(request):
     return render(request, 'core/500.html', status=500)
+
+
+def metrics(request):
+    """Метрики в формате Prometheus; только для внутренних адресов."""
+    if (not settings.METRICS_ENABLED
+            or request.META.get('REMOTE_ADDR')
+            not in settings.METRICS_ALLOWED_IPS):
+        raise Http404
+    return HttpResponse(
+        registry.prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
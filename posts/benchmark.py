@@ -0,0 +1,193 @@
+"""Прогон страниц posts через тестовый клиент с замерами.
+
+Для каждого URL из posts/urls.py: задержка (p50/p95/p99), число
+SQL-запросов и размер ответа. Отчёт — словарь, который команда
+``benchmark`` печатает как JSON, чтобы сравнивать коммиты между собой.
+"""
+import statistics
+import subprocess
+import time
+from collections import namedtuple
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from core.queries import QueryLog, observe
+from posts.models import Comment, Group, Post, User, UserStats
+
+
+Target = namedtuple('Target', 'name method path data client')
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу: share=0.95 — p95."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(share * len(ordered)) - 1))
+    return ordered[index]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _client(user=None):
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    return client
+
+
+class NotEnoughData(Exception):
+    pass
+
+
+def _first(queryset, what):
+    found = queryset.first()
+    if found is None:
+        raise NotEnoughData(f'в базе нет {what}')
+    return found
+
+
+def targets(writes=True):
+    """Что и от чьего имени запрашивать.
+
+    Берутся самые тяжёлые объекты: группа с наибольшим числом постов,
+    самый популярный автор, самый обсуждаемый пост и читатель
+    с наибольшим числом подписок. Без writes пропускаются запросы,
+    которые пишут в базу: комментарий, подписка и отписка.
+    """
+    author = _first(
+        UserStats.objects.select_related('user').order_by('-follower_count'),
+        'счётчиков пользователей (UserStats)'
+    ).user
+    reader = _first(
+        UserStats.objects.select_related('user').order_by('-following_count'),
+        'счётчиков пользователей (UserStats)'
+    ).user
+    group = _first(
+        Group.objects.annotate(total=Count('posts')).order_by('-total'),
+        'групп'
+    )
+    discussed = Comment.objects.values('post').annotate(
+        total=Count('pk')
+    ).order_by('-total').values_list('post', flat=True).first()
+    post = Post.objects.get(pk=discussed) if discussed else _first(
+        Post.objects.order_by('-pub_date'), 'постов'
+    )
+    if writes:
+        stranger = _first(
+            User.objects.exclude(pk=reader.pk).exclude(
+                following__user=reader
+            ).order_by('pk'),
+            f'пользователя, на которого не подписан {reader.username}'
+        )
+
+    guest = _client()
+    reading = _client(reader)
+    writing = _client(post.author)
+    found = [
+        Target('posts_list', 'get', reverse('posts:posts_list'), None,
+               guest),
+        Target('group_list', 'get',
+               reverse('posts:group_list', args=[group.slug]), None, guest),
+        Target('profile', 'get',
+               reverse('posts:profile', args=[author.username]), None,
+               reading),
+        Target('post_detail', 'get',
+               reverse('posts:post_detail', args=[post.pk]), None, reading),
+        Target('post_comments', 'get',
+               reverse('posts:post_comments', args=[post.pk]), None,
+               reading),
+        Target('follow_index', 'get', reverse('posts:follow_index'), None,
+               reading),
+        Target('search', 'get', reverse('posts:search'), {'q': 'кофе'},
+               guest),
+        Target('trending', 'get', reverse('posts:trending'), None, guest),
+        Target('post_create', 'get', reverse('posts:post_create'), None,
+               writing),
+        Target('post_edit', 'get',
+               reverse('posts:post_edit', args=[post.pk]), None, writing),
+    ]
+    if not writes:
+        return found
+    return found + [
+        Target('add_comment', 'post',
+               reverse('posts:add_comment', args=[post.pk]),
+               {'text': 'Комментарий из бенчмарка'}, reading),
+        # Подписка и отписка идут парой, чтобы граф не менялся.
+        Target('profile_follow', 'get',
+               reverse('posts:profile_follow', args=[stranger.username]),
+               None, reading),
+        Target('profile_unfollow', 'get',
+               reverse('posts:profile_unfollow', args=[stranger.username]),
+               None, reading),
+    ]
+
+
+def measure(target, iterations):
+    timings, queries, sizes, statuses = [], [], [], set()
+    request = getattr(target.client, target.method)
+    for _ in range(iterations):
+        # Наблюдатель core.queries видит и запросы, которые асинхронные
+        # view выполняют в потоках пула, а не только в этом соединении.
+        with observe(QueryLog()) as log:
+            started = time.perf_counter()
+            response = request(target.path, target.data or {})
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(log))
+        sizes.append(len(response.content))
+        statuses.add(response.status_code)
+    return {
+        'method': target.method.upper(),
+        'path': target.path,
+        'status': sorted(statuses),
+        'first_ms': round(timings[0], 2),
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'p99_ms': round(percentile(timings, 0.99), 2),
+        'queries': statistics.median_low(queries),
+        'queries_max': max(queries),
+        'bytes': statistics.median_low(sizes),
+    }
+
+
+def run(iterations, dataset=None, writes=True):
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'cache': settings.CACHES['default']['BACKEND'],
+            'iterations': iterations,
+            'writes': writes,
+            'dataset': dataset or {
+                'users': User.objects.count(),
+                'groups': Group.objects.count(),
+                'posts': Post.objects.count(),
+                'comments': Comment.objects.count(),
+            },
+        },
+        'urls': {},
+    }
+    found = targets(writes)
+    try:
+        for target in found:
+            report['urls'][target.name] = measure(target, iterations)
+    finally:
+        # force_login создал сессии в базе: удаляем их за собой.
+        for client in {id(target.client): target.client
+                       for target in found}.values():
+            client.logout()
+    return report
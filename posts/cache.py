@@ -0,0 +1,136 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+
+GENERATION_PREFIX = 'generation'
+
+
+def _key(namespace):
+    return f'{GENERATION_PREFIX}:{namespace}'
+
+
+def _fresh():
+    # Новое поколение всегда больше любого выданного раньше, даже если
+    # счётчик вытеснили из кэша, а фрагменты остались.
+    return time.time_ns()
+
+
+def generation(*namespaces):
+    """Текущая версия набора пространств имён для ключа фрагмента."""
+    keys = [_key(namespace) for namespace in namespaces if namespace]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _fresh(), timeout=None)
+            found[key] = cache.get(key)
+    return '.'.join(str(found[key]) for key in keys)
+
+
+def _bump_now(namespaces):
+    # Не incr: в файловом кэше это чтение и запись без блокировки, и из
+    # двух параллельных сдвигов один мог потеряться. Новое значение
+    # записывается целиком и всегда отличается от прежних.
+    fresh = _fresh()
+    cache.set_many(
+        {_key(namespace): fresh for namespace in namespaces}, timeout=None
+    )
+
+
+def bump(*namespaces):
+    """Сдвигает поколения пространств имён.
+
+    Внутри транзакции поколение сдвигается ещё раз после коммита:
+    иначе параллельный запрос мог бы успеть закэшировать под новой
+    версией данные, которые ещё не закоммичены.
+    """
+    namespaces = tuple(namespace for namespace in namespaces if namespace)
+    _bump_now(namespaces)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump_now(namespaces))
+
+
+def fragment_context(*namespaces):
+    return {
+        'cache_version': generation(*namespaces),
+        'cache_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
+    }
+
+
+def cached_response(namespace, key, build):
+    """Тело и тип ответа, закэшированные под поколением namespace.
+
+    Возвращает (content, content_type, etag). build() вызывается только
+    при промахе и должен вернуть HttpResponse.
+    """
+    version = generation(namespace)
+    digest = hashlib.md5(
+        f'{namespace}|{version}|{key}'.encode(), usedforsecurity=False
+    ).hexdigest()
+    cache_key = f'response:{digest}'
+    cached = cache.get(cache_key)
+    if cached is None:
+        response = build()
+        cached = (response.content, response['Content-Type'])
+        cache.set(cache_key, cached, settings.FRAGMENT_CACHE_TIMEOUT)
+    return (*cached, f'W/"{digest}"')
+
+
+def post_namespaces(post):
+    return (
+        'posts',
+        f'post:{post.id}',
+        f'profile:{post.author_id}',
+        f'group:{post.group_id}' if post.group_id else None,
+    )
+
+
+def detail_namespaces(post):
+    """От чего зависит тело страницы поста: сам пост, счётчик постов
+    автора и название группы."""
+    return (
+        f'post:{post.id}',
+        f'profile:{post.author_id}',
+        f'group_info:{post.group_id}' if post.group_id else None,
+    )
+
+
+def page_etag(request, *namespaces, extra=()):
+    """Слабый ETag страницы для условного GET.
+
+    Кроме поколений данных в него входит всё, что меняет разметку для
+    конкретного запроса: пользователь из шапки, CSRF-токен форм и
+    параметры адреса (курсор ленты).
+    """
+    user = request.user
+    parts = [
+        generation(*namespaces),
+        str(user.pk),
+        user.get_username(),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        request.GET.urlencode(),
+        *(str(part) for part in extra),
+    ]
+    digest = hashlib.md5(
+        '|'.join(parts).encode(), usedforsecurity=False
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+def not_modified(request, etag):
+    """304 Not Modified, если у клиента уже есть эта версия страницы."""
+    return get_conditional_response(request, etag=etag)
+
+
+def set_validators(request, response, etag):
+    response['ETag'] = etag
+    # Клиент и CDN хранят страницу, но каждый раз сверяют её по ETag.
+    if request.user.is_authenticated:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
@@ -0,0 +1,60 @@
+"""Подписка и отписка одной командой записи.
+
+Подписка — INSERT ... ON CONFLICT DO NOTHING, отписка — один DELETE:
+повторный или параллельный клик не падает на unique_list и не
+удваивает счётчики. Запись идёт мимо сигналов, поэтому счётчики,
+ленту и граф обновляем сами — в той же транзакции и только если
+строка действительно добавилась или удалилась.
+"""
+from django.db import connection, transaction
+
+from posts import graph, stats, timeline
+from posts.models import Follow
+
+
+def followed(user_id, author_id):
+    """Следствия новой подписки (зовут и сигналы Follow)."""
+    stats.bump(user_id, following_count=1)
+    stats.bump(author_id, follower_count=1)
+    timeline.add_author(user_id, author_id)
+    graph.invalidate(user_id, author_id)
+
+
+def unfollowed(user_id, author_id):
+    stats.bump(user_id, following_count=-1)
+    stats.bump(author_id, follower_count=-1)
+    timeline.remove_author(user_id, author_id)
+    timeline.follower_left(author_id)
+    graph.invalidate(user_id, author_id)
+
+
+@transaction.atomic
+def follow(user, author):
+    """Подписывает user на author; True, если подписки ещё не было."""
+    if user.pk == author.pk:
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {Follow._meta.db_table} (user_id, author_id) '
+            'VALUES (%s, %s) ON CONFLICT DO NOTHING',
+            [user.pk, author.pk]
+        )
+        created = cursor.rowcount == 1
+    if created:
+        followed(user.pk, author.pk)
+    return created
+
+
+@transaction.atomic
+def unfollow(user, author):
+    """Отписывает user от author; True, если подписка была."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {Follow._meta.db_table} '
+            'WHERE user_id = %s AND author_id = %s',
+            [user.pk, author.pk]
+        )
+        deleted = cursor.rowcount == 1
+    if deleted:
+        unfollowed(user.pk, author.pk)
+    return deleted
@@ -1,5 +1,6 @@
 from django import forms
 from django.forms import ModelForm, Textarea
+from posts.images import normalize_image
 from posts.models import Post, Comment
 
 
@@ -13,6 +14,14 @@ class PostForm(forms.ModelForm):
             'image': 'якартинко'
             }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Новый файл пришёл только если это загрузка, а не текущая
+        # картинка поста или отметка «очистить».
+        if image and hasattr(image, 'content_type'):
+            return normalize_image(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
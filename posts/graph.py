@@ -0,0 +1,114 @@
+"""Граф подписок: кто на кого подписан.
+
+Списки смежности пользователя — на кого он подписан и кто подписан на
+него — лежат в кэше отсортированными массивами int64: 8 байт на связь,
+а проверка связи — двоичный поиск без построения множества. Любой
+вопрос к графу — один get_many по кэшу и, для промахов, один запрос
+к Follow сразу за всех недостающих пользователей.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db import transaction
+
+from posts.models import Follow
+
+
+FOLLOWING = 'following'
+FOLLOWERS = 'followers'
+COLUMNS = {
+    FOLLOWING: ('user_id', 'author_id'),
+    FOLLOWERS: ('author_id', 'user_id'),
+}
+CACHE_TIMEOUT = 60 * 60
+# Списки подписчиков звёзд в кэш не кладём: они велики и меняются
+# с каждой подпиской.
+MAX_CACHED_EDGES = 10000
+
+
+def _key(direction, user_id):
+    return f'graph:{direction}:{user_id}'
+
+
+def _pk(user):
+    return getattr(user, 'pk', user)
+
+
+def _contains(ids, value):
+    index = bisect_left(ids, value)
+    return index < len(ids) and ids[index] == value
+
+
+def adjacency(direction, users):
+    """Словарь {id пользователя: отсортированный array id соседей}."""
+    user_ids = {_pk(user) for user in users}
+    keys = {_key(direction, user_id): user_id for user_id in user_ids}
+    result = {}
+    for key, packed in cache.get_many(keys).items():
+        result[keys[key]] = array('q', packed)
+    missing = user_ids - result.keys()
+    if not missing:
+        return result
+    source, target = COLUMNS[direction]
+    edges = {user_id: [] for user_id in missing}
+    for user_id, other_id in Follow.objects.filter(
+        **{f'{source}__in': missing}
+    ).values_list(source, target).iterator():
+        edges[user_id].append(other_id)
+    to_cache = {}
+    for user_id, ids in edges.items():
+        result[user_id] = array('q', sorted(ids))
+        if len(ids) <= MAX_CACHED_EDGES:
+            to_cache[_key(direction, user_id)] = result[user_id].tobytes()
+    cache.set_many(to_cache, CACHE_TIMEOUT)
+    return result
+
+
+def following_ids(user):
+    """На кого подписан пользователь, по возрастанию id."""
+    return list(adjacency(FOLLOWING, [user])[_pk(user)])
+
+
+def follower_ids(user):
+    """Кто подписан на пользователя, по возрастанию id."""
+    return list(adjacency(FOLLOWERS, [user])[_pk(user)])
+
+
+def is_following(viewer, authors):
+    """Словарь {id автора: подписан ли на него viewer}.
+
+    Для гостя все значения False, к кэшу и базе он не обращается.
+    """
+    author_ids = [_pk(author) for author in authors]
+    if viewer is None or not viewer.is_authenticated:
+        return dict.fromkeys(author_ids, False)
+    following = adjacency(FOLLOWING, [viewer])[viewer.pk]
+    return {
+        author_id: _contains(following, author_id)
+        for author_id in author_ids
+    }
+
+
+def mutual_ids(user):
+    """Взаимные подписки: пользователь и они подписаны друг на друга."""
+    user_id = _pk(user)
+    following = adjacency(FOLLOWING, [user_id])[user_id]
+    followers = adjacency(FOLLOWERS, [user_id])[user_id]
+    return sorted(set(following).intersection(followers))
+
+
+def _forget(keys):
+    cache.delete_many(keys)
+
+
+def invalidate(user_id, author_id):
+    """Сбрасывает списки обоих концов связи.
+
+    Как и поколения фрагментов, внутри транзакции списки сбрасываются
+    ещё раз после коммита, чтобы не закэшировать незакоммиченное.
+    """
+    keys = [_key(FOLLOWING, user_id), _key(FOLLOWERS, author_id)]
+    _forget(keys)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _forget(keys))
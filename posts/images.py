@@ -0,0 +1,72 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from PIL import Image, ImageOps
+
+
+def normalize_image(upload):
+    """Приводит загруженную картинку к виду, в котором её стоит хранить.
+
+    Поворот по EXIF применяется, сами метаданные отбрасываются;
+    картинка уменьшается до POST_IMAGE_MAX_DIMENSION и пережимается
+    с POST_IMAGE_QUALITY. Исходник читается с диска (большие загрузки
+    Django пишет во временный файл чанками), результат тоже пишется
+    во временный файл, поэтому память не зависит от размера загрузки.
+    """
+    if upload.size > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл слишком большой: не больше %(limit)s МБ.',
+            params={'limit': settings.POST_IMAGE_MAX_UPLOAD_SIZE // 2 ** 20},
+            code='file_too_large',
+        )
+    max_side = settings.POST_IMAGE_MAX_DIMENSION
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            # Pillow сам отказывает только вдвое выше своего предела,
+            # поэтому размер сверяем до того, как пиксели прочитаны.
+            width, height = image.size
+            if width * height > settings.POST_IMAGE_MAX_PIXELS:
+                raise ValidationError(
+                    'Изображение слишком большое: не больше '
+                    '%(limit)s Мпикс.',
+                    params={
+                        'limit': settings.POST_IMAGE_MAX_PIXELS // 10 ** 6
+                    },
+                    code='image_too_large',
+                )
+            # JPEG умеет декодироваться сразу в уменьшенном масштабе.
+            image.draft('RGB', (max_side, max_side))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+            has_alpha = image.mode in ('RGBA', 'LA') or (
+                image.mode == 'P' and 'transparency' in image.info
+            )
+            if has_alpha:
+                image = image.convert('RGBA')
+                image_format, extension, params = 'PNG', 'png', {
+                    'optimize': True,
+                }
+            else:
+                image = image.convert('RGB')
+                image_format, extension, params = 'JPEG', 'jpg', {
+                    'quality': settings.POST_IMAGE_QUALITY,
+                    'optimize': True,
+                    'progressive': True,
+                }
+            output = tempfile.SpooledTemporaryFile(
+                max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+            )
+            # Новое изображение без info: EXIF и прочие метаданные
+            # в файл не попадут.
+            image.save(output, format=image_format, **params)
+    except (Image.DecompressionBombError, OSError, SyntaxError):
+        raise ValidationError(
+            'Не удалось прочитать изображение.', code='invalid_image'
+        )
+    output.seek(0)
+    base = os.path.splitext(os.path.basename(upload.name))[0]
+    return File(output, name=f'{base}.{extension}')
@@ -0,0 +1,87 @@
+import json
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings, setup_databases, teardown_databases
+)
+
+from posts import benchmark
+from posts.seed import seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'Бенчмарк страниц posts: засевает синтетические данные во '
+        'временную базу, прогоняет каждый URL тестовым клиентом и '
+        'печатает JSON с p50/p95/p99, числом запросов и размером ответа'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок на пользователя'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument(
+            '--existing', action='store_true',
+            help=(
+                'Мерить текущую базу как есть, без временной базы и данных. '
+                'Страницы, которые пишут в базу (комментарий, подписка), '
+                'при этом не запрашиваются'
+            )
+        )
+        parser.add_argument('--output', help='Записать отчёт ещё и в файл')
+
+    def isolated_caches(self):
+        # Фрагменты временной базы не должны смешиваться с рабочими.
+        default = dict(settings.CACHES['default'])
+        if default['BACKEND'].endswith('FileBasedCache'):
+            default['LOCATION'] = tempfile.mkdtemp(prefix='yatube_bench_')
+        else:
+            default['KEY_PREFIX'] = 'benchmark'
+        return {**settings.CACHES, 'default': default}
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        if options['existing']:
+            with override_settings(DEBUG=False):
+                try:
+                    report = benchmark.run(iterations, writes=False)
+                except benchmark.NotEnoughData as error:
+                    raise CommandError(
+                        f'Нечего мерить: {error}. Засейте данные командой '
+                        'seed_yatube или запустите без --existing.'
+                    )
+        else:
+            old_config = setup_databases(
+                verbosity=0, interactive=False, aliases={'default'}
+            )
+            try:
+                with override_settings(
+                    DEBUG=False, CACHES=self.isolated_caches()
+                ):
+                    self.stderr.write('Создаю синтетические данные...')
+                    dataset = seed_dataset(
+                        users=options['users'],
+                        groups=options['groups'],
+                        posts=options['posts'],
+                        comments=options['comments'],
+                        follows=options['follows'],
+                        seed=options['seed'],
+                    )
+                    self.stderr.write('Прогоняю страницы...')
+                    report = benchmark.run(iterations, dataset)
+            finally:
+                teardown_databases(old_config, verbosity=0)
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+        self.stdout.write(output)
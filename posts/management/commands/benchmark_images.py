@@ -0,0 +1,65 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+
+from posts import thumbnails
+from posts.models import Post
+
+
+# Сколько пикселей нужно клиенту под картинку карточки:
+# телефон 360px с плотностью 2x и десктоп с карточкой 960px.
+CLIENTS = {
+    'mobile': 720,
+    'desktop': 960,
+}
+LEGACY_THUMBNAIL = ('960x339', {'crop': 'center', 'upscale': True})
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает байты картинок на странице ленты: одна миниатюра '
+        '960x339 против вариантов srcset/<picture>'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=10,
+            help='Сколько последних постов с картинками взять'
+        )
+
+    def pick(self, variants, needed):
+        """Что выберет браузер: самый узкий вариант не уже нужного."""
+        for image_format in tuple(settings.POST_IMAGE_FORMATS) + (
+            thumbnails.FALLBACK_FORMAT,
+        ):
+            found = sorted(variants.get(image_format, []))
+            if found:
+                wide_enough = [item for item in found if item[0] >= needed]
+                return (wide_enough or found[-1:])[0]
+        return None
+
+    def handle(self, *args, **options):
+        backend = default.backend
+        posts = Post.objects.exclude(image='').order_by('-pub_date')[
+            :options['posts']
+        ]
+        report = {'posts': 0, 'before': 0}
+        report.update({client: 0 for client in CLIENTS})
+        for post in posts:
+            name = post.image.name
+            legacy = backend.generate(
+                name, LEGACY_THUMBNAIL[0], **LEGACY_THUMBNAIL[1]
+            )
+            report['before'] += default.storage.size(legacy.name)
+            variants = {}
+            for geometry_string, spec in thumbnails.post_image_specs():
+                thumbnail = backend.generate(name, geometry_string, **spec)
+                variants.setdefault(spec['format'], []).append(
+                    (thumbnail.width, default.storage.size(thumbnail.name))
+                )
+            for client, needed in CLIENTS.items():
+                report[client] += self.pick(variants, needed)[1]
+            report['posts'] += 1
+        self.stdout.write(json.dumps(report, indent=2))
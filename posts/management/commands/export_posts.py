@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.seed import BATCH_SIZE
+from posts.transfer import export_posts
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты в JSON Lines: автор, группа, текст, дата и путь '
+        'к картинке. Читает таблицу итератором, память не растёт'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', '-o', default='-',
+            help='Файл для выгрузки, по умолчанию stdout'
+        )
+        parser.add_argument('--author', help='Только посты этого автора')
+        parser.add_argument('--group', help='Только посты этой группы')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE * 5)
+
+    def handle(self, *args, **options):
+        queryset = Post.objects.all()
+        if options['author']:
+            queryset = queryset.filter(author__username=options['author'])
+        if options['group']:
+            queryset = queryset.filter(group__slug=options['group'])
+        started = time.monotonic()
+        last_report = started
+
+        def progress(total):
+            nonlocal last_report
+            now = time.monotonic()
+            if now - last_report >= 1:
+                last_report = now
+                self.stderr.write(
+                    f'{total} постов, {total / (now - started):.0f} строк/с'
+                )
+
+        if options['output'] == '-':
+            total = export_posts(
+                self.stdout, queryset, options['batch_size'], progress
+            )
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                total = export_posts(
+                    stream, queryset, options['batch_size'], progress
+                )
+        elapsed = time.monotonic() - started
+        self.stderr.write(
+            f'Выгружено постов: {total} за {elapsed:.1f} с, '
+            f'{total / elapsed if elapsed else 0:.0f} строк/с'
+        )
@@ -0,0 +1,71 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.seed import BATCH_SIZE
+from posts.transfer import import_posts
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает посты из JSON Lines пачками через bulk_create и сразу '
+        'обновляет счётчики, ленты подписок, поиск и популярное'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл JSON Lines, по умолчанию stdin'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE * 5)
+        parser.add_argument(
+            '--create-missing', action='store_true',
+            help='Создавать незнакомых авторов (без пароля) и группы'
+        )
+        parser.add_argument(
+            '--max-errors', type=int, default=20,
+            help='Сколько ошибочных строк показать'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        last_report = started
+        shown = 0
+
+        def progress(imported, skipped):
+            nonlocal last_report
+            now = time.monotonic()
+            if now - last_report >= 1:
+                last_report = now
+                self.stderr.write(
+                    f'{imported} постов, пропущено {skipped}, '
+                    f'{imported / (now - started):.0f} строк/с'
+                )
+
+        def on_error(number, message):
+            nonlocal shown
+            if shown < options['max_errors']:
+                self.stderr.write(f'Строка {number}: {message}')
+            shown += 1
+
+        def load(lines):
+            return import_posts(
+                lines,
+                batch_size=options['batch_size'],
+                create_missing=options['create_missing'],
+                progress=progress,
+                on_error=on_error,
+            )
+
+        if options['path'] == '-':
+            imported, skipped = load(sys.stdin)
+        else:
+            with open(options['path'], encoding='utf-8') as stream:
+                imported, skipped = load(stream)
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Загружено постов: {imported}, пропущено строк: {skipped} '
+            f'за {elapsed:.1f} с, '
+            f'{imported / elapsed if elapsed else 0:.0f} строк/с'
+        )
@@ -0,0 +1,108 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.benchmark import percentile
+
+
+DEFAULT_PATHS = (
+    '/', '/group/{group}/', '/profile/{author}/', '/posts/{post}/'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест запущенного сервера: N параллельных клиентов '
+        'гоняют страницы по кругу, в конце — запросы в секунду и задержки. '
+        'Один и тот же прогон против WSGI (gunicorn sync) и ASGI '
+        '(gunicorn + uvicorn worker) сравнивает деплой.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'base_url', help='Адрес сервера, например http://127.0.0.1:8000'
+        )
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help=(
+                'Путь страницы, можно несколько раз. В пути подставляются '
+                '{group}, {author} и {post}'
+            )
+        )
+        parser.add_argument('--group', default='test-group')
+        parser.add_argument('--author', default='admin')
+        parser.add_argument('--post', default='1')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument(
+            '--requests', type=int, default=2000,
+            help='Сколько запросов сделать всего'
+        )
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def fetch(self, url, timeout):
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                size = len(response.read())
+                status = response.status
+        except urllib.error.HTTPError as error:
+            size, status = 0, error.code
+        except (urllib.error.URLError, OSError):
+            size, status = 0, None
+        return time.perf_counter() - started, status, size
+
+    def handle(self, *args, **options):
+        base_url = options['base_url'].rstrip('/')
+        values = {key: options[key] for key in ('group', 'author', 'post')}
+        urls = [
+            base_url + path.format(**values)
+            for path in options['paths'] or DEFAULT_PATHS
+        ]
+        total = options['requests']
+        if total < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests и --concurrency должны быть > 0')
+
+        counter = iter(range(total))
+        lock = threading.Lock()
+        results = []
+
+        def client():
+            while True:
+                with lock:
+                    number = next(counter, None)
+                if number is None:
+                    return
+                outcome = self.fetch(urls[number % len(urls)],
+                                     options['timeout'])
+                with lock:
+                    results.append(outcome)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            for _ in range(options['concurrency']):
+                pool.submit(client)
+        elapsed = time.perf_counter() - started
+
+        latencies = [seconds * 1000 for seconds, status, _ in results
+                     if status is not None and status < 400]
+        report = {
+            'urls': urls,
+            'concurrency': options['concurrency'],
+            'requests': len(results),
+            'errors': len(results) - len(latencies),
+            'seconds': round(elapsed, 3),
+            'requests_per_second': round(len(results) / elapsed, 1),
+            'bytes': sum(size for _, _, size in results),
+            'latency_ms': {
+                name: round(percentile(latencies, share), 2)
+                if latencies else None
+                for name, share in (('p50', 0.5), ('p95', 0.95),
+                                    ('p99', 0.99))
+            },
+        }
+        self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts.trending import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает веса «Популярного» для всех постов и групп с нуля. '
+        'Запускайте после rebuild_user_stats: вес поста зависит от числа '
+        'подписчиков автора'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = rebuild(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитаны веса {total} постов')
+        )
@@ -0,0 +1,89 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts.seed import BATCH_SIZE, seed_dataset, seeded_users
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами, '
+        'комментариями и подписками. Одинаковые параметры и --seed дают '
+        'одинаковые данные; в PostgreSQL строки идут через COPY'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=300000)
+        parser.add_argument(
+            '--follows', type=int, default=30,
+            help='Среднее число подписок на пользователя'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней растянуть даты постов'
+        )
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Префикс имён пользователей и slug групп'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE * 5)
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Вставлять через bulk_create даже в PostgreSQL'
+        )
+
+    def progress(self, table, done, total):
+        now = time.monotonic()
+        if done < total and now - self.last_report < 1:
+            return
+        self.last_report = now
+        elapsed = now - self.started[table]
+        share = f' ({done * 100 // total}%)' if total else ''
+        self.stderr.write(
+            f'{table}: {done}/{total}{share}, '
+            f'{done / elapsed if elapsed else 0:.0f} строк/с'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 and (options['posts'] or options['follows']):
+            raise CommandError('Нужно хотя бы два пользователя')
+        if seeded_users(options['prefix']).exists():
+            raise CommandError(
+                f'Данные с префиксом «{options["prefix"]}» уже есть: '
+                'выберите другой --prefix'
+            )
+        self.last_report = 0
+        self.started = {}
+        started = time.monotonic()
+
+        def progress(table, done, total):
+            self.started.setdefault(table, time.monotonic())
+            self.progress(table, done, total)
+
+        created = seed_dataset(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            seed=options['seed'],
+            days=options['days'],
+            prefix=options['prefix'],
+            batch_size=options['batch_size'],
+            use_copy=not options['no_copy'],
+            progress=progress,
+            stage=lambda name: self.stderr.write(f'Пересчитываю {name}...'),
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(json.dumps({
+            'database': connection.vendor,
+            'created': created,
+            'seconds': round(elapsed, 1),
+            'rows_per_second': round(sum(created.values()) / elapsed),
+        }, ensure_ascii=False, indent=2))
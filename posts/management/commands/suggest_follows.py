@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import cache, suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации подписок («кого почитать») по всему '
+        'графу Follow. Запускается периодически, например из cron'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=suggestions.TOP_N)
+        parser.add_argument(
+            '--batch-size', type=int, default=suggestions.BATCH_SIZE,
+            help='Сколько id подписчиков пересчитывать в одной транзакции'
+        )
+
+    def progress(self, done, last, total):
+        self.stderr.write(f'до id {done} из {last}: {total} рекомендаций')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = suggestions.rebuild(
+            top_n=options['top'], batch_size=options['batch_size'],
+            progress=self.progress if options['verbosity'] > 1 else None,
+        )
+        cache.bump('suggestions')
+        self.stdout.write(
+            f'Рекомендаций: {total} '
+            f'за {time.monotonic() - started:.1f} с'
+        )
@@ -0,0 +1,24 @@
+# Generated by Django 4.0.6 on 2026-10-18 13:40
+
+from django.db import migrations
+
+
+def install_search(apps, schema_editor):
+    from posts import search
+    search.install(schema_editor.connection)
+
+
+def uninstall_search(apps, schema_editor):
+    from posts import search
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_post_updated'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
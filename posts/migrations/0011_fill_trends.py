@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def fill_trends(apps, schema_editor):
+    # Посты, опубликованные до появления «Популярного», получают вес
+    # по дате, числу подписчиков автора и комментариям.
+    from posts import trending
+    trending.rebuild(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_trending'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_trends, migrations.RunPython.noop),
+    ]
@@ -14,9 +14,21 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: автор и группа подтягиваются одним JOIN."""
+        return self.select_related('author', 'group').only(
+            'id', 'text', 'pub_date', 'updated', 'image',
+            'author_id', 'group_id',
+            'author__username', 'author__first_name', 'author__last_name',
+            'group__title', 'group__slug',
+        )
+
+
 class Post(models.Model):
     text = models.TextField('Текст поста', help_text='Введите текст поста')
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -33,10 +45,24 @@ class Post(models.Model):
     )
     image = models.ImageField('Изображение', upload_to='posts/', blank=True)
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Ленты листаются курсором по (pub_date, id), см. posts.paginator.
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='post_pub_date'),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_pub_date'),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_pub_date'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -61,6 +87,13 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=('post', 'created', 'id'),
+                name='comment_post_created'),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -80,3 +113,135 @@ class Follow(models.Model):
                 fields=('user', 'author'),
                 name='unique_list')
         ]
+        indexes = [
+            models.Index(
+                fields=('author', 'user'),
+                name='follow_author_user'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок: пост, разложенный подписчику."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_timeline_post')
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='timeline_user_pub_date'),
+            models.Index(
+                fields=('user', 'author'),
+                name='timeline_user_author'),
+        ]
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики автора для профиля и страницы поста."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    post_count = models.PositiveIntegerField('Постов', default=0)
+    comment_count = models.PositiveIntegerField('Комментариев', default=0)
+    follower_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+
+class FollowSuggestion(models.Model):
+    """Кого почитать: авторы в двух шагах по графу подписок.
+
+    Таблица пересчитывается целиком командой suggest_follows.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    overlap = models.PositiveIntegerField(
+        'Общих подписок', default=0
+    )
+    score = models.FloatField('Вес', default=0)
+
+    class Meta:
+        verbose_name = 'Рекомендация подписки'
+        verbose_name_plural = 'Рекомендации подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_suggestion')
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-score'),
+                name='suggestion_user_score'),
+        ]
+
+
+class PostTrend(models.Model):
+    """Вес поста в ленте «Популярное», см. posts.trending."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trend'
+    )
+    score = models.FloatField('Вес', default=0)
+
+    class Meta:
+        verbose_name = 'Популярность поста'
+        verbose_name_plural = 'Популярность постов'
+        indexes = [
+            models.Index(
+                fields=('-score', '-post'),
+                name='post_trend_score'),
+        ]
+
+
+class GroupTrend(models.Model):
+    """Вес группы в рейтинге популярных групп, см. posts.trending."""
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trend'
+    )
+    score = models.FloatField('Вес', default=0)
+
+    class Meta:
+        verbose_name = 'Популярность группы'
+        verbose_name_plural = 'Популярность групп'
+        indexes = [
+            models.Index(fields=('-score',), name='group_trend_score'),
+        ]
@@ -0,0 +1,212 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+CURSOR_PARAM = 'cursor'
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage:
+    """Страница ленты без номера и без общего количества записей.
+
+    Записи выбираются при первом обращении, поэтому страница, чей
+    фрагмент шаблона взят из кэша, не делает запросов к базе.
+    """
+
+    def __init__(self, paginator, loader, cursor=''):
+        self.paginator = paginator
+        # Курсор, по которому выбрана страница; битый — пустая строка.
+        # Годится в ключ кэша вместо сырого параметра запроса.
+        self.cursor = cursor
+        self._loader = loader
+        self._result = None
+
+    def __repr__(self):
+        return f'<CursorPage: {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def _load(self):
+        if self._result is None:
+            self._result = self._loader()
+        return self._result
+
+    @property
+    def object_list(self):
+        return self._load()[0]
+
+    @property
+    def next_cursor(self):
+        return self._load()[1]
+
+    @property
+    def previous_cursor(self):
+        return self._load()[2]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-пагинация по набору полей, например (pub_date, id).
+
+    Вместо COUNT(*) и OFFSET каждая страница выбирается условием
+    «строго после последней записи предыдущей страницы», поэтому
+    стоимость запроса не зависит от глубины страницы.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-pub_date', '-id'),
+                 transform=None):
+        descending = {field.startswith('-') for field in ordering}
+        if len(descending) != 1:
+            raise ValueError(
+                'Все поля курсора должны сортироваться в одном направлении'
+            )
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.descending = descending.pop()
+        self.fields = tuple(field.lstrip('-') for field in ordering)
+        self.transform = transform
+
+    def encode_cursor(self, obj, direction):
+        values = [
+            self._field(name).value_to_string(obj) for name in self.fields
+        ]
+        raw = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, values = json.loads(
+                base64.urlsafe_b64decode(padded.encode())
+            )
+            if direction not in (FORWARD, BACKWARD):
+                raise InvalidCursor(cursor)
+            if len(values) != len(self.fields):
+                raise InvalidCursor(cursor)
+            values = [
+                self._field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (binascii.Error, TypeError, ValueError, ValidationError):
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def clean_cursor(self, cursor):
+        """Курсор как есть, если он читается, иначе пустая строка."""
+        if not cursor:
+            return ''
+        try:
+            self.decode_cursor(cursor)
+        except InvalidCursor:
+            return ''
+        return cursor
+
+    def get_page(self, cursor=None):
+        """Возвращает страницу по курсору; битый курсор — первая страница."""
+        cursor = self.clean_cursor(cursor)
+        return CursorPage(self, lambda: self._load(cursor), cursor)
+
+    def _load(self, cursor):
+        if cursor:
+            try:
+                direction, values = self.decode_cursor(cursor)
+            except InvalidCursor:
+                return self._first_page()
+            if direction == BACKWARD:
+                return self._page_before(values)
+            return self._page_after(values)
+        return self._first_page()
+
+    def _field(self, name):
+        return self.queryset.model._meta.get_field(name)
+
+    def _reversed_ordering(self):
+        return tuple(
+            field.lstrip('-') if field.startswith('-') else f'-{field}'
+            for field in self.ordering
+        )
+
+    def _seek(self, values, forward):
+        # (a, b) < (x, y)  <=>  a < x OR (a = x AND b < y)
+        lookup = 'lt' if self.descending == forward else 'gt'
+        condition = Q()
+        for index, name in enumerate(self.fields):
+            step = Q(**{f'{name}__{lookup}': values[index]})
+            for prev_name, prev_value in zip(
+                self.fields[:index], values[:index]
+            ):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        # Избыточное условие на первое поле даёт базе границу диапазона
+        # в индексе, которую она не всегда выводит из OR сама.
+        bound = 'lte' if lookup == 'lt' else 'gte'
+        return Q(**{f'{self.fields[0]}__{bound}': values[0]}) & condition
+
+    def _first_page(self):
+        rows = list(
+            self.queryset.order_by(*self.ordering)[:self.per_page + 1]
+        )
+        return self._build(rows, has_more=len(rows) > self.per_page,
+                           has_before=False)
+
+    def _page_after(self, values):
+        rows = list(
+            self.queryset.filter(self._seek(values, forward=True))
+            .order_by(*self.ordering)[:self.per_page + 1]
+        )
+        return self._build(rows, has_more=len(rows) > self.per_page,
+                           has_before=True)
+
+    def _page_before(self, values):
+        rows = list(
+            self.queryset.filter(self._seek(values, forward=False))
+            .order_by(*self._reversed_ordering())[:self.per_page + 1]
+        )
+        has_before = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        if not has_before and len(rows) < self.per_page:
+            # Дошли до начала ленты: отдаём честную первую страницу.
+            return self._first_page()
+        return self._build(rows, has_more=True, has_before=has_before)
+
+    def _build(self, rows, has_more, has_before):
+        rows = rows[:self.per_page]
+        next_cursor = previous_cursor = None
+        if rows and has_more:
+            next_cursor = self.encode_cursor(rows[-1], FORWARD)
+        if rows and has_before:
+            previous_cursor = self.encode_cursor(rows[0], BACKWARD)
+        if self.transform is not None:
+            rows = self.transform(rows)
+        return rows, next_cursor, previous_cursor
+
+
+def get_cursor_page(request, queryset, per_page, **kwargs):
+    paginator = CursorPaginator(queryset, per_page, **kwargs)
+    return paginator.get_page(request.GET.get(CURSOR_PARAM))
@@ -0,0 +1,230 @@
+"""Полнотекстовый поиск по постам.
+
+Документ поста — текст, название группы и имя автора. Где он хранится,
+зависит от базы:
+
+* PostgreSQL — столбец ``search_vector`` (tsvector) в таблице постов
+  с GIN-индексом, ранжирование через ``ts_rank``;
+* SQLite — виртуальная таблица FTS5 ``posts_post_fts``, ранжирование
+  через ``bm25``;
+* остальные базы — ``icontains`` без ранжирования.
+
+Индекс обновляется из сигналов (posts.signals), а создаётся и
+заполняется миграцией.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from posts.models import Post
+
+
+FTS_TABLE = 'posts_post_fts'
+BATCH_SIZE = 500
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+_fts5_support = {}
+
+
+def _vendor(conn):
+    if conn.vendor == 'postgresql':
+        return 'postgresql'
+    if conn.vendor == 'sqlite' and _has_fts5(conn):
+        return 'sqlite'
+    return None
+
+
+def _has_fts5(conn):
+    if conn.alias not in _fts5_support:
+        with conn.cursor() as cursor:
+            cursor.execute('PRAGMA compile_options')
+            options = {row[0] for row in cursor.fetchall()}
+        _fts5_support[conn.alias] = 'ENABLE_FTS5' in options
+    return _fts5_support[conn.alias]
+
+
+def _config():
+    return getattr(settings, 'SEARCH_CONFIG', 'russian')
+
+
+def _tables():
+    return {
+        'post': Post._meta.db_table,
+        'group': Post._meta.get_field('group').related_model._meta.db_table,
+        'user': Post._meta.get_field('author').related_model._meta.db_table,
+    }
+
+
+def install(conn):
+    """Создаёт хранилище индекса и заполняет его (для миграции)."""
+    vendor = _vendor(conn)
+    tables = _tables()
+    with conn.cursor() as cursor:
+        if vendor == 'postgresql':
+            cursor.execute(
+                f'ALTER TABLE {tables["post"]} '
+                'ADD COLUMN IF NOT EXISTS search_vector tsvector'
+            )
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS posts_post_search_gin '
+                f'ON {tables["post"]} USING gin (search_vector)'
+            )
+        elif vendor == 'sqlite':
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+                'text, group_title, author, '
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            )
+    rebuild(conn)
+
+
+def uninstall(conn):
+    vendor = _vendor(conn)
+    with conn.cursor() as cursor:
+        if vendor == 'postgresql':
+            cursor.execute('DROP INDEX IF EXISTS posts_post_search_gin')
+            cursor.execute(
+                f'ALTER TABLE {_tables()["post"]} '
+                'DROP COLUMN IF EXISTS search_vector'
+            )
+        elif vendor == 'sqlite':
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def _documents_sql(where=''):
+    tables = _tables()
+    return (
+        'SELECT p.id, p.text, COALESCE(g.title, \'\'), '
+        "u.first_name || ' ' || u.last_name || ' ' || u.username "
+        f'FROM {tables["post"]} p '
+        f'JOIN {tables["user"]} u ON u.id = p.author_id '
+        f'LEFT JOIN {tables["group"]} g ON g.id = p.group_id {where}'
+    )
+
+
+def _pg_update(cursor, where='', params=()):
+    tables = _tables()
+    config = _config()
+    # Текст важнее группы, группа важнее автора.
+    cursor.execute(
+        f'UPDATE {tables["post"]} p SET search_vector = '
+        "setweight(to_tsvector(%s::regconfig, p.text), 'A') || "
+        'setweight(to_tsvector(%s::regconfig, COALESCE('
+        f'(SELECT g.title FROM {tables["group"]} g WHERE g.id = p.group_id), '
+        "'')), 'B') || "
+        'setweight(to_tsvector(%s::regconfig, '
+        "(SELECT u.first_name || ' ' || u.last_name || ' ' || u.username "
+        f'FROM {tables["user"]} u WHERE u.id = p.author_id)), \'C\') '
+        f'{where}',
+        [config, config, config, *params]
+    )
+
+
+def rebuild(conn=connection):
+    """Пересобирает индекс всех постов."""
+    vendor = _vendor(conn)
+    with conn.cursor() as cursor:
+        if vendor == 'postgresql':
+            _pg_update(cursor)
+        elif vendor == 'sqlite':
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text, group_title, author) '
+                + _documents_sql()
+            )
+
+
+def index_posts(post_ids):
+    """Обновляет документы постов после их изменения."""
+    vendor = _vendor(connection)
+    post_ids = list(post_ids)
+    for start in range(0, len(post_ids), BATCH_SIZE):
+        batch = post_ids[start:start + BATCH_SIZE]
+        marks = ', '.join(['%s'] * len(batch))
+        with connection.cursor() as cursor:
+            if vendor == 'postgresql':
+                _pg_update(cursor, f'WHERE p.id IN ({marks})', batch)
+            elif vendor == 'sqlite':
+                cursor.execute(
+                    f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({marks})', batch
+                )
+                cursor.execute(
+                    f'INSERT INTO {FTS_TABLE} '
+                    '(rowid, text, group_title, author) '
+                    + _documents_sql(f'WHERE p.id IN ({marks})'),
+                    batch
+                )
+
+
+def unindex_post(post_id):
+    # В PostgreSQL документ живёт в строке поста и удаляется вместе с ней.
+    if _vendor(connection) == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+            )
+
+
+def _fts5_query(query):
+    # Каждое слово — отдельная фраза с префиксным поиском: так
+    # пользовательский ввод не интерпретируется как синтаксис FTS5.
+    return ' '.join(f'"{word}"*' for word in _WORD.findall(query))
+
+
+def search_post_ids(query, limit=None):
+    """id постов по запросу, от самых релевантных к менее релевантным."""
+    limit = limit or settings.SEARCH_MAX_RESULTS
+    query = query.strip()
+    if not _WORD.search(query):
+        return []
+    vendor = _vendor(connection)
+    with connection.cursor() as cursor:
+        if vendor == 'postgresql':
+            cursor.execute(
+                f'SELECT id FROM {_tables()["post"]}, '
+                'websearch_to_tsquery(%s::regconfig, %s) query '
+                'WHERE search_vector @@ query '
+                'ORDER BY ts_rank(search_vector, query) DESC, '
+                'pub_date DESC LIMIT %s',
+                [_config(), query, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+        if vendor == 'sqlite':
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}, 3.0, 2.0, 1.0), rowid DESC '
+                'LIMIT %s',
+                [_fts5_query(query), limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+    return list(
+        Post.objects.filter(text__icontains=query)
+        .order_by('-pub_date', '-id')
+        .values_list('id', flat=True)[:limit]
+    )
+
+
+def filter_posts(queryset, query):
+    """Посты queryset, подходящие под запрос, без предела числа результатов.
+
+    Для админки: порядок и постраничный вывод остаются за ней, а
+    совпадения отбираются подзапросом к тому же индексу.
+    """
+    query = query.strip()
+    if not _WORD.search(query):
+        return queryset.none()
+    vendor = _vendor(connection)
+    if vendor == 'postgresql':
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT id FROM {_tables()["post"]} '
+            'WHERE search_vector @@ websearch_to_tsquery(%s::regconfig, %s)',
+            [_config(), query]
+        ))
+    if vendor == 'sqlite':
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [_fts5_query(query)]
+        ))
+    return queryset.filter(text__icontains=query)
@@ -0,0 +1,380 @@
+"""Синтетические данные для бенчмарков и локального воспроизведения.
+
+Всё детерминировано зерном генератора: один и тот же набор параметров
+даёт те же строки. Строки порождаются генераторами и пишутся пачками:
+в PostgreSQL через ``COPY``, в остальных базах через ``bulk_create``,
+так что память не растёт с размером набора. Производные таблицы
+(счётчики, ленты подписок, поисковый индекс) пересчитываются в конце
+целиком, потому что сигналы при такой вставке не срабатывают.
+
+Популярность авторов подчиняется закону Ципфа: немногие авторы
+собирают большую часть подписок и пишут большую часть постов.
+"""
+import bisect
+import io
+import random
+import re
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import chain, islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.utils import timezone
+
+from posts import cache, search, stats, suggestions, timeline, trending
+from posts.models import Comment, Follow, Group, Post, User
+
+
+BATCH_SIZE = 1000
+ZIPF_EXPONENT = 1.1
+
+WORDS = (
+    'дом лес река город утро вечер море книга кофе дорога поезд '
+    'музыка кино осень зима весна лето друг работа отпуск кот собака '
+    'сад небо солнце дождь снег горы поход фото рецепт история'
+).split()
+
+
+def batches(iterable, size=BATCH_SIZE):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Zipf:
+    """Ранги 0..count-1 с вероятностью ~ 1 / (ранг + 1) ** exponent.
+
+    Обратная функция непрерывного приближения распределения: выборка
+    за O(1) без таблицы весов на каждый элемент.
+    """
+
+    def __init__(self, count, exponent=ZIPF_EXPONENT):
+        if exponent == 1:
+            raise ValueError('exponent должен отличаться от 1')
+        self.count = count
+        self.power = 1 - exponent
+        self.span = (count + 1) ** self.power - 1
+
+    def rank(self, rng):
+        value = (rng.random() * self.span + 1) ** (1 / self.power) - 1
+        return min(int(value), self.count - 1)
+
+
+class IdRanges:
+    """Отсортированные id, сжатые в непрерывные отрезки.
+
+    Свежевставленные строки почти всегда идут подряд, так что
+    и миллионы id занимают несколько чисел.
+    """
+
+    def __init__(self, ids):
+        self.starts = []
+        self.offsets = []
+        self.length = 0
+        last = None
+        for pk in ids:
+            if last is None or pk != last + 1:
+                self.starts.append(pk)
+                self.offsets.append(self.length)
+            self.length += 1
+            last = pk
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for number, start in enumerate(self.starts):
+            end = (self.offsets[number + 1] if number + 1 < len(self.starts)
+                   else self.length)
+            yield from range(start, start + end - self.offsets[number])
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.length:
+            raise IndexError(index)
+        run = bisect.bisect(self.offsets, index) - 1
+        return self.starts[run] + index - self.offsets[run]
+
+    @classmethod
+    def of(cls, queryset):
+        return cls(
+            queryset.order_by('pk').values_list('pk', flat=True).iterator()
+        )
+
+
+@contextmanager
+def explicit_dates():
+    """Даёт задать даты постов и комментариев руками.
+
+    auto_now/auto_now_add перезаписывают значение и в bulk_create,
+    а синтетическим данным нужна история, а не одна секунда.
+    """
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Post._meta.get_field('updated'),
+        Comment._meta.get_field('created'),
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class _CopyStream(io.TextIOBase):
+    """Файл для COPY FROM STDIN, который читает строки из генератора."""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.buffer = ''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            self.buffer += line
+        if size < 0:
+            size = len(self.buffer)
+        chunk, self.buffer = self.buffer[:size], self.buffer[size:]
+        return chunk
+
+
+_COPY_ESCAPES = str.maketrans({
+    '\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r',
+})
+
+
+def _copy_value(field, obj):
+    value = field.get_db_prep_save(getattr(obj, field.attname), connection)
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value).translate(_COPY_ESCAPES)
+
+
+def _copy(model, objects, batch_size, progress):
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key
+    ]
+    columns = ', '.join(
+        connection.ops.quote_name(field.column) for field in fields
+    )
+    total = 0
+
+    def lines():
+        nonlocal total
+        for batch in batches(objects, batch_size):
+            for obj in batch:
+                yield '\t'.join(
+                    _copy_value(field, obj) for field in fields
+                ) + '\n'
+            total += len(batch)
+            progress(total)
+
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {connection.ops.quote_name(model._meta.db_table)} '
+            f'({columns}) FROM STDIN',
+            _CopyStream(lines()),
+        )
+    return total
+
+
+def _bulk_create(model, objects, batch_size, progress):
+    total = 0
+    for batch in batches(objects, batch_size):
+        model.objects.bulk_create(batch, batch_size=batch_size)
+        total += len(batch)
+        progress(total)
+    return total
+
+
+def seeded_users(prefix):
+    """Пользователи, созданные прогоном с этим префиксом, и только они.
+
+    Имена — ``<prefix>_<номер>``: startswith захватил бы и прогоны
+    с более длинным префиксом (seed и seedx).
+    """
+    return User.objects.filter(
+        username__regex=rf'^{re.escape(prefix)}_[0-9]+$'
+    )
+
+
+def seeded_groups(prefix):
+    return Group.objects.filter(
+        slug__regex=rf'^{re.escape(prefix)}-group-[0-9]+$'
+    )
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def seed_dataset(*, users, groups, posts, comments, follows, seed=0,
+                 days=365, prefix='seed', batch_size=BATCH_SIZE,
+                 use_copy=True, progress=None, stage=None):
+    """Создаёт набор данных и возвращает число строк по таблицам.
+
+    ``follows`` — среднее число подписок на пользователя.
+    ``progress(table, done, total)`` вызывается после каждой пачки,
+    ``stage(name)`` — перед каждым шагом пересчёта производных таблиц.
+    """
+    rng = random.Random(seed)
+    now = timezone.now().replace(microsecond=0)
+    start = now - timedelta(days=days)
+    span = (now - start).total_seconds()
+    password = make_password(None)
+    copy = use_copy and connection.vendor == 'postgresql'
+
+    def insert(name, model, objects, total):
+        def report(done):
+            if progress is not None:
+                progress(name, done, total)
+
+        write = _copy if copy else _bulk_create
+        return write(model, objects, batch_size, report)
+
+    created = {}
+    created['users'] = insert('users', User, (
+        User(username=f'{prefix}_{number}', password=password,
+             first_name=rng.choice(WORDS).capitalize(),
+             last_name=rng.choice(WORDS).capitalize(),
+             date_joined=now)
+        for number in range(users)
+    ), users)
+    user_ids = IdRanges.of(seeded_users(prefix))
+
+    created['groups'] = insert('groups', Group, (
+        Group(title=f'Группа {number}', slug=f'{prefix}-group-{number}',
+              description=_text(rng, 12))
+        for number in range(groups)
+    ), groups)
+    group_ids = IdRanges.of(seeded_groups(prefix))
+
+    # Чем «популярнее» пользователь (меньше ранг), тем больше он пишет
+    # и тем больше у него подписчиков.
+    authors = Zipf(len(user_ids))
+
+    def make_posts():
+        for number in range(posts):
+            pub_date = start + timedelta(seconds=span * number / posts)
+            yield Post(
+                author_id=user_ids[authors.rank(rng)],
+                group_id=(group_ids[rng.randrange(len(group_ids))]
+                          if group_ids and rng.random() < 0.7 else None),
+                text=_text(rng, rng.randint(5, 60)),
+                image='',
+                pub_date=pub_date,
+                updated=pub_date,
+            )
+
+    with explicit_dates():
+        created['posts'] = insert('posts', Post, make_posts(), posts)
+        # id растут вместе с датой: дата поста восстанавливается по
+        # его номеру, не перечитывая таблицу.
+        post_ids = IdRanges.of(
+            Post.objects.filter(author__in=seeded_users(prefix))
+        )
+
+        def make_comments():
+            # Свежие посты обсуждают чаще старых.
+            recent = Zipf(len(post_ids))
+            for _ in range(comments):
+                index = len(post_ids) - 1 - recent.rank(rng)
+                offset = span * index / len(post_ids)
+                offset += rng.uniform(0, 3 * 86400)
+                yield Comment(
+                    post_id=post_ids[index],
+                    author_id=user_ids[rng.randrange(len(user_ids))],
+                    text=_text(rng, rng.randint(3, 25)),
+                    created=start + timedelta(seconds=min(offset, span)),
+                )
+
+        created['comments'] = insert(
+            'comments', Comment, make_comments() if post_ids else (),
+            comments
+        )
+
+    def make_follows():
+        limit = len(user_ids) - 1
+        for user_id in user_ids:
+            wanted = min(limit, int(rng.expovariate(1 / follows))
+                         if follows else 0)
+            chosen = set()
+            # Популярных авторов выпадает много, поэтому попыток
+            # ограниченное число, а не «пока не наберём».
+            for _ in range(wanted * 3):
+                if len(chosen) >= wanted:
+                    break
+                author_id = user_ids[authors.rank(rng)]
+                if author_id != user_id:
+                    chosen.add(author_id)
+            for author_id in sorted(chosen):
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    created['follows'] = insert(
+        'follows', Follow, make_follows(), users * follows
+    )
+    rebuild_derived(stage, user_ids, group_ids)
+    return created
+
+
+def bump_generations(user_ids=(), group_ids=()):
+    """Сдвигает поколения фрагментов, которые могла задеть вставка.
+
+    Общий кэш не очищается: в нём лежат и сессии, и чужие данные.
+    Новые строки попадают в общую ленту, профили своих авторов и ленты
+    своих групп; страницы постов и комментариев новых id ещё не
+    кэшировались.
+    """
+    cache.bump('posts', 'suggestions')
+    namespaces = chain(
+        (f'profile:{pk}' for pk in user_ids),
+        chain.from_iterable(
+            (f'group:{pk}', f'group_info:{pk}') for pk in group_ids
+        ),
+    )
+    for batch in batches(namespaces):
+        cache.bump(*batch)
+
+
+def rebuild_derived(stage=None, user_ids=(), group_ids=()):
+    """Пересчитывает то, что обычно поддерживают сигналы.
+
+    Производные таблицы пересчитываются целиком, для всех
+    пользователей, а не только для вставленных: у остальных строки
+    меняются, только если счётчики успели разойтись с данными.
+    Поколения фрагментов сдвигаются для общей ленты и для переданных
+    ``user_ids`` и ``group_ids``.
+
+    Ленты подписок, рекомендации и веса популярного пересчитываются
+    после счётчиков: по ним отсекаются авторы, чьи посты не
+    раскладываются, вершины графа со слишком многими подписками, и
+    считается вес новых постов.
+    """
+    steps = (
+        ('stats', stats.rebuild_stats),
+        ('timeline', timeline.rebuild),
+        ('suggestions', suggestions.rebuild),
+        ('trending', trending.rebuild),
+        ('search', search.rebuild),
+        ('cache', lambda: bump_generations(user_ids, group_ids)),
+    )
+    for name, step in steps:
+        if stage is not None:
+            stage(name)
+        step()
@@ -0,0 +1,103 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from posts import cache, follows, search, stats, timeline, trending
+from posts.models import Comment, Follow, Group, Post, User
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, **kwargs):
+    if instance._state.adding or not instance.pk:
+        return
+    # При смене группы устаревает и лента прежней группы.
+    old_group = Post.objects.filter(pk=instance.pk).values_list(
+        'group_id', flat=True
+    ).first()
+    if old_group != instance.group_id:
+        cache.bump(f'group:{old_group}' if old_group else None)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    cache.bump(*cache.post_namespaces(instance))
+    search.index_posts([instance.id])
+    if created:
+        stats.bump(instance.author_id, post_count=1)
+        timeline.fan_out_post(instance)
+        trending.record_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    cache.bump(*cache.post_namespaces(instance), f'comments:{instance.id}')
+    search.unindex_post(instance.id)
+    stats.bump(instance.author_id, post_count=-1)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    # Ссылка на группу есть и в карточках лент профилей её авторов.
+    authors = instance.posts.values_list('author_id', flat=True).distinct()
+    cache.bump(
+        'posts', f'group:{instance.id}', f'group_info:{instance.id}',
+        *(f'profile:{author_id}' for author_id in authors.iterator()),
+    )
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    if not created:
+        # Название группы входит в поисковый документ её постов.
+        search.index_posts(
+            instance.posts.values_list('id', flat=True).iterator()
+        )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields == frozenset({'last_login'}):
+        return
+    # Имя автора выводится в карточках постов — в том числе в лентах
+    # групп — и в комментариях, а ещё ищется поиском.
+    groups = instance.posts.exclude(group=None).values_list(
+        'group_id', flat=True
+    ).distinct()
+    discussed = instance.comments.values_list(
+        'post_id', flat=True
+    ).distinct()
+    cache.bump(
+        'posts', f'profile:{instance.id}',
+        *(f'group:{group_id}' for group_id in groups.iterator()),
+        *(f'comments:{post_id}' for post_id in discussed.iterator()),
+    )
+    search.index_posts(
+        instance.posts.values_list('id', flat=True).iterator()
+    )
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        cache.bump(f'comments:{instance.post_id}')
+        stats.bump(instance.author_id, comment_count=1)
+        trending.record_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    cache.bump(f'comments:{instance.post_id}')
+    stats.bump(instance.author_id, comment_count=-1)
+
+
+# Страницы подписываются через posts.follows, мимо сигналов; эти
+# обработчики ловят остальные пути: API, админку, ORM.
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        follows.followed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    follows.unfollowed(instance.user_id, instance.author_id)
@@ -0,0 +1,82 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from posts.models import Comment, Follow, Post, User, UserStats
+
+
+COUNTERS = {
+    'post_count': (Post, 'author'),
+    'comment_count': (Comment, 'author'),
+    'follower_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def _count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        Value(0),
+    )
+
+
+def _users_with_counts():
+    return User.objects.annotate(**{
+        name: _count_subquery(model, field)
+        for name, (model, field) in COUNTERS.items()
+    })
+
+
+def _create_stats(user_id):
+    counts = _users_with_counts().filter(pk=user_id).values(*COUNTERS)
+    try:
+        with transaction.atomic():
+            return UserStats.objects.create(user_id=user_id, **counts.get())
+    except IntegrityError:
+        return UserStats.objects.get(user_id=user_id)
+
+
+def stats_for(user_id):
+    stats = UserStats.objects.filter(user_id=user_id).first()
+    return stats or _create_stats(user_id)
+
+
+def get_stats(user):
+    """Счётчики пользователя; недостающая запись считается один раз."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        user.stats = _create_stats(user.pk)
+        return user.stats
+
+
+def bump(user_id, **deltas):
+    """Атомарно сдвигает счётчики пользователя на заданные величины.
+
+    Если записи ещё нет, ничего не делаем: get_stats посчитает её
+    с нуля при первом чтении, и это изменение уже будет учтено.
+    """
+    UserStats.objects.filter(user_id=user_id).update(**{
+        name: F(name) + delta for name, delta in deltas.items()
+    })
+
+
+@transaction.atomic
+def rebuild_stats(batch_size=1000):
+    """Пересчитывает счётчики всех пользователей с нуля."""
+    UserStats.objects.all().delete()
+    batch = []
+    total = 0
+    for row in _users_with_counts().values('pk', *COUNTERS).iterator():
+        batch.append(UserStats(user_id=row.pop('pk'), **row))
+        if len(batch) >= batch_size:
+            UserStats.objects.bulk_create(batch)
+            total += len(batch)
+            batch = []
+    UserStats.objects.bulk_create(batch)
+    return total + len(batch)
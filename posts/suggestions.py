@@ -0,0 +1,113 @@
+"""Рекомендации подписок: друзья друзей по графу Follow.
+
+Кандидаты для пользователя u — авторы c, на которых подписаны те, на
+кого подписан u (u → m → c), кроме самого u и тех, на кого он уже
+подписан. Вес — число таких m (общих подписок), умноженное на
+активность автора: от 1 у молчащих до 2 у тех, у кого не меньше
+ACTIVITY_CAP постов.
+
+Весь граф считается в базе соединением Follow с самим собой и оконной
+функцией для top-N, пачками по диапазонам id подписчиков, так что ни
+граф, ни пары кандидатов не поднимаются в Python.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min
+
+from posts.models import Follow, FollowSuggestion, UserStats
+
+
+TOP_N = 10
+ACTIVITY_CAP = 100
+BATCH_SIZE = 1000
+
+
+def hop_limit():
+    """Сколько подписок может быть у промежуточного пользователя.
+
+    Тот, кто подписан на всех, ничего не говорит о вкусах и даёт
+    квадратичное число пар: такие вершины графа пропускаются.
+    """
+    return getattr(settings, 'SUGGESTION_HOP_LIMIT', 1000)
+
+
+_SELECT = (
+    'SELECT user_id, author_id, overlap, score FROM ('
+    'SELECT c.user_id, c.author_id, c.overlap, '
+    'c.overlap * {activity} AS score, '
+    'ROW_NUMBER() OVER ('
+    'PARTITION BY c.user_id '
+    'ORDER BY c.overlap * {activity} DESC, c.author_id'
+    ') AS place '
+    'FROM ('
+    'SELECT f1.user_id, f2.author_id, COUNT(*) AS overlap '
+    'FROM {follow} f1 '
+    'JOIN {follow} f2 ON f2.user_id = f1.author_id '
+    'JOIN {stats} m ON m.user_id = f1.author_id '
+    'WHERE f1.user_id BETWEEN %s AND %s '
+    'AND m.following_count <= %s '
+    'AND f2.author_id <> f1.user_id '
+    'AND NOT EXISTS ('
+    'SELECT 1 FROM {follow} f3 '
+    'WHERE f3.user_id = f1.user_id AND f3.author_id = f2.author_id'
+    ') '
+    'GROUP BY f1.user_id, f2.author_id'
+    ') c '
+    'LEFT JOIN {stats} s ON s.user_id = c.author_id'
+    ') ranked '
+    'WHERE place <= %s'
+)
+_ACTIVITY = (
+    '(1.0 + CASE WHEN COALESCE(s.post_count, 0) > {cap} THEN {cap} '
+    'ELSE COALESCE(s.post_count, 0) END / {cap}.0)'
+)
+
+
+def _rebuild_range(cursor, first, last, top_n):
+    table = FollowSuggestion._meta.db_table
+    cursor.execute(
+        f'DELETE FROM {table} WHERE user_id BETWEEN %s AND %s',
+        [first, last]
+    )
+    cursor.execute(
+        f'INSERT INTO {table} (user_id, author_id, overlap, score) '
+        + _SELECT.format(
+            follow=Follow._meta.db_table,
+            stats=UserStats._meta.db_table,
+            activity=_ACTIVITY.format(cap=ACTIVITY_CAP),
+        ),
+        [first, last, hop_limit(), top_n]
+    )
+    return cursor.rowcount
+
+
+def rebuild(top_n=TOP_N, batch_size=BATCH_SIZE, progress=None):
+    """Пересчитывает рекомендации всех пользователей.
+
+    Каждый диапазон подписчиков заменяется в своей транзакции, поэтому
+    читатели видят либо старые, либо новые рекомендации пользователя.
+    Счётчики подписок (UserStats) должны быть актуальны.
+    """
+    bounds = Follow.objects.aggregate(first=Min('user'), last=Max('user'))
+    if bounds['first'] is None:
+        FollowSuggestion.objects.all().delete()
+        return 0
+    FollowSuggestion.objects.filter(user__lt=bounds['first']).delete()
+    FollowSuggestion.objects.filter(user__gt=bounds['last']).delete()
+    total = 0
+    for first in range(bounds['first'], bounds['last'] + 1, batch_size):
+        last = first + batch_size - 1
+        with transaction.atomic(), connection.cursor() as cursor:
+            total += _rebuild_range(cursor, first, last, top_n)
+        if progress is not None:
+            progress(min(last, bounds['last']), bounds['last'], total)
+    return total
+
+
+def for_user(user, limit=5):
+    """Лучшие рекомендации пользователя одним запросом."""
+    return list(
+        FollowSuggestion.objects.filter(user=user)
+        .select_related('author')
+        .order_by('-score', 'author_id')[:limit]
+    )
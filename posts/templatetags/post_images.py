@@ -0,0 +1,52 @@
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from posts import thumbnails
+
+
+register = template.Library()
+
+DEFAULT_SIZES = '(max-width: 960px) 100vw, 960px'
+
+
+def _srcset(variants):
+    return ', '.join(f'{url} {width}w' for width, url in sorted(variants))
+
+
+@register.simple_tag
+def post_picture(post, css_class='card-img my-2', sizes=DEFAULT_SIZES):
+    """<picture> с вариантами картинки поста по ширинам и форматам.
+
+    Пока варианты не готовы, ставит их генерацию в очередь и выводит
+    заглушку: сам запрос картинки не режет. Если генерация недавно
+    упала, заглушка выводится без новой попытки.
+    """
+    if not post.image:
+        return ''
+    variants, missing = thumbnails.lookup_variants(post.image)
+    if missing:
+        thumbnails.schedule(post.image.name)
+    fallback = variants.get(thumbnails.FALLBACK_FORMAT)
+    if not fallback:
+        return format_html(
+            '<img class="{}" src="{}" alt="">',
+            css_class, static(settings.THUMBNAIL_PLACEHOLDER)
+        )
+    sources = format_html_join(
+        '\n  ',
+        '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (thumbnails.MIME_TYPES[image_format], _srcset(found), sizes)
+            for image_format, found in variants.items()
+            if image_format != thumbnails.FALLBACK_FORMAT
+        ),
+    )
+    # В src — вариант, ближайший к ширине карточки по умолчанию.
+    src = min(fallback, key=lambda variant: abs(variant[0] - 960))[1]
+    return format_html(
+        '<picture>\n  {}\n  <img class="{}" src="{}" srcset="{}" '
+        'sizes="{}" alt="">\n</picture>',
+        sources, css_class, src, _srcset(fallback), sizes
+    )
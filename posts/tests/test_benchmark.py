@@ -0,0 +1,186 @@
+import io
+import json
+import random
+
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from posts import benchmark
+from posts.cache import generation
+from posts.models import (
+    Comment, Follow, Group, Post, TimelineEntry, User, UserStats
+)
+from posts.seed import IdRanges, Zipf, seed_dataset
+
+
+class SeedTests(TestCase):
+    sizes = {
+        'users': 40, 'groups': 3, 'posts': 200, 'comments': 300,
+        'follows': 5,
+    }
+
+    def test_counts_and_derived_data(self):
+        created = seed_dataset(**self.sizes)
+        self.assertEqual(created['users'], User.objects.count())
+        self.assertEqual(created['posts'], Post.objects.count())
+        self.assertEqual(created['comments'], Comment.objects.count())
+        self.assertEqual(created['follows'], Follow.objects.count())
+        self.assertFalse(
+            Follow.objects.filter(user_id=F('author_id')).exists()
+        )
+        busiest = UserStats.objects.order_by('-follower_count').first()
+        self.assertEqual(
+            busiest.follower_count,
+            Follow.objects.filter(author=busiest.user_id).count()
+        )
+        expected = sum(
+            Post.objects.filter(author=follow.author_id).count()
+            for follow in Follow.objects.all()
+        )
+        self.assertEqual(TimelineEntry.objects.count(), expected)
+        # Даты заданы явно, а не «сейчас» для всех строк.
+        self.assertGreater(
+            Post.objects.values('pub_date').distinct().count(), 100
+        )
+
+    def test_bumps_generations_instead_of_clearing_cache(self):
+        cache.set('unrelated', 'kept')
+        before = generation('posts')
+        seed_dataset(**self.sizes)
+        self.assertEqual(cache.get('unrelated'), 'kept')
+        self.assertNotEqual(generation('posts'), before)
+        author = User.objects.get(username='seed_0')
+        self.assertIsNotNone(cache.get(f'generation:profile:{author.id}'))
+
+    def test_power_law_follow_graph(self):
+        seed_dataset(**self.sizes)
+        counts = sorted(
+            UserStats.objects.values_list('follower_count', flat=True),
+            reverse=True
+        )
+        # Четверть самых популярных собирает больше половины подписок.
+        self.assertGreater(sum(counts[:10]), sum(counts) / 2)
+
+    def test_deterministic(self):
+        seed_dataset(**self.sizes, seed=7)
+        first = list(Follow.objects.values_list(
+            'user__username', 'author__username'
+        ).order_by('user__username', 'author__username'))
+        Follow.objects.all().delete()
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        seed_dataset(**self.sizes, seed=7)
+        second = list(Follow.objects.values_list(
+            'user__username', 'author__username'
+        ).order_by('user__username', 'author__username'))
+        self.assertEqual(first, second)
+
+
+    def test_longer_prefix_is_not_reused(self):
+        seed_dataset(**self.sizes, prefix='seedx')
+        seedx = set(UserStats.objects.values_list('user', 'post_count'))
+        created = seed_dataset(
+            users=5, groups=1, posts=5, comments=5, follows=1, prefix='seed'
+        )
+        self.assertEqual(created['posts'], 5)
+        # Все новые посты достались пользователям нового прогона.
+        self.assertEqual(
+            Post.objects.filter(author__username__startswith='seed_').count(),
+            5
+        )
+        self.assertEqual(
+            set(UserStats.objects.filter(
+                user__username__startswith='seedx'
+            ).values_list('user', 'post_count')), seedx
+        )
+
+class BenchmarkCommandTests(TestCase):
+    def test_report(self):
+        seed_dataset(users=20, groups=2, posts=50, comments=40, follows=3)
+        out = io.StringIO()
+        call_command('benchmark', '--existing', '--iterations', '2',
+                     stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['meta']['iterations'], 2)
+        self.assertEqual(set(report['urls']), {
+            'posts_list', 'group_list', 'profile', 'post_detail',
+            'post_comments', 'follow_index', 'search', 'trending',
+            'post_create', 'post_edit',
+        })
+        for name, row in report['urls'].items():
+            with self.subTest(url=name):
+                self.assertTrue(set(row['status']) <= {200, 302})
+                self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+                self.assertGreaterEqual(row['queries_max'], row['queries'])
+
+    def test_existing_database_is_not_written(self):
+        seed_dataset(users=20, groups=2, posts=50, comments=40, follows=3)
+        before = (Comment.objects.count(), Follow.objects.count())
+        call_command('benchmark', '--existing', '--iterations', '2',
+                     stdout=io.StringIO())
+        self.assertEqual(
+            (Comment.objects.count(), Follow.objects.count()), before
+        )
+        self.assertFalse(Session.objects.exists())
+
+    def test_write_targets(self):
+        seed_dataset(users=20, groups=2, posts=50, comments=40, follows=3)
+        names = [target.name for target in benchmark.targets()]
+        self.assertIn('add_comment', names)
+        self.assertIn('profile_follow', names)
+
+    def test_empty_database(self):
+        with self.assertRaisesMessage(CommandError, 'Нечего мерить'):
+            call_command('benchmark', '--existing', stdout=io.StringIO())
+
+
+@override_settings(ASYNC_READS_THREAD_SENSITIVE=False)
+class BenchmarkPoolTests(TransactionTestCase):
+    """Запросы из потоков пула чтений тоже попадают в отчёт."""
+
+    def test_counts_queries_of_async_views(self):
+        cache.clear()
+        seed_dataset(users=20, groups=2, posts=50, comments=40, follows=3)
+        report = benchmark.run(1, writes=False)
+        for name, row in report['urls'].items():
+            with self.subTest(url=name):
+                self.assertGreater(row['queries'], 0)
+
+
+class SeedHelpersTests(TestCase):
+    def test_id_ranges(self):
+        ids = [1, 2, 3, 7, 8, 20]
+        ranges = IdRanges(ids)
+        self.assertEqual(len(ranges), 6)
+        self.assertEqual(list(ranges), ids)
+        self.assertEqual([ranges[index] for index in range(6)], ids)
+        self.assertEqual(len(ranges.starts), 3)
+        with self.assertRaises(IndexError):
+            ranges[6]
+
+    def test_zipf(self):
+        rng = random.Random(1)
+        zipf = Zipf(1000)
+        ranks = [zipf.rank(rng) for _ in range(20000)]
+        self.assertTrue(all(0 <= rank < 1000 for rank in ranks))
+        top = sum(1 for rank in ranks if rank < 10)
+        tail = sum(1 for rank in ranks if rank >= 500)
+        self.assertGreater(top, tail)
+
+
+class SeedCommandTests(TestCase):
+    def test_seed_yatube(self):
+        out = io.StringIO()
+        call_command(
+            'seed_yatube', users=30, groups=2, posts=100, comments=50,
+            follows=3, batch_size=7, stdout=out, stderr=io.StringIO()
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['created']['posts'], 100)
+        self.assertEqual(Post.objects.count(), 100)
+        with self.assertRaises(CommandError):
+            call_command('seed_yatube', users=5, stderr=io.StringIO())
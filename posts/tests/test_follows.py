@@ -0,0 +1,177 @@
+import threading
+import unittest
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import follows
+from posts.models import Follow, Post, TimelineEntry, User, UserStats
+from posts.stats import rebuild_stats
+
+
+class FollowWriteTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='writereader')
+        cls.author = User.objects.create_user(username='writeauthor')
+        Post.objects.create(author=cls.author, text='Пост для ленты')
+        rebuild_stats()
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def statements(self, action, *args):
+        with CaptureQueriesContext(connection) as captured:
+            result = action(*args)
+        # Точки сохранения от atomic() не в счёт.
+        return result, [
+            query['sql'] for query in captured
+            if 'SAVEPOINT' not in query['sql']
+        ]
+
+    def test_follow_is_idempotent(self):
+        self.assertTrue(follows.follow(self.reader, self.author))
+        created, sql = self.statements(
+            follows.follow, self.reader, self.author
+        )
+        self.assertFalse(created)
+        self.assertEqual(len(sql), 1)
+        self.assertIn('ON CONFLICT DO NOTHING', sql[0])
+        self.assertEqual(self.stats(self.author).follower_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=self.reader).count(), 1)
+        self.assertFalse(follows.follow(self.reader, self.reader))
+
+    def test_unfollow_is_idempotent(self):
+        follows.follow(self.reader, self.author)
+        self.assertTrue(follows.unfollow(self.reader, self.author))
+        deleted, sql = self.statements(
+            follows.unfollow, self.reader, self.author
+        )
+        self.assertFalse(deleted)
+        self.assertEqual(len(sql), 1)
+        self.assertTrue(sql[0].startswith('DELETE'))
+        self.assertEqual(self.stats(self.author).follower_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+
+
+class FollowConcurrencyTests(TransactionTestCase):
+    """Много одновременных кликов «Подписаться» и «Отписаться»."""
+
+    threads = 8
+    rounds = 5
+
+    @classmethod
+    def setUpClass(cls):
+        # Имя тестовой базы известно только после её создания.
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise unittest.SkipTest(
+                'SQLite в памяти не пускает параллельные записи из потоков'
+            )
+        super().setUpClass()
+
+    def setUp(self):
+        cache.clear()
+        self.readers = [
+            User.objects.create_user(username=f'racer{count}')
+            for count in range(self.threads)
+        ]
+        self.author = User.objects.create_user(username='raceauthor')
+        Post.objects.create(author=self.author, text='Гонка')
+        rebuild_stats()
+
+    def hammer(self, urls_for, users=None):
+        users = users or self.readers
+        barrier = threading.Barrier(len(users), timeout=10)
+        errors = []
+
+        def worker(client, urls):
+            try:
+                barrier.wait()
+                for url in urls:
+                    response = client.get(url)
+                    if response.status_code != 302:
+                        errors.append(response.status_code)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        workers = []
+        for reader in users:
+            client = Client(raise_request_exception=True)
+            client.force_login(reader)
+            workers.append(threading.Thread(
+                target=worker, args=(client, urls_for(reader))
+            ))
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def assertConsistent(self):
+        followers = Follow.objects.filter(author=self.author).count()
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).follower_count, followers
+        )
+        for reader in self.readers:
+            following = Follow.objects.filter(user=reader).count()
+            self.assertEqual(
+                UserStats.objects.get(user=reader).following_count, following
+            )
+            self.assertEqual(
+                TimelineEntry.objects.filter(user=reader).count(), following
+            )
+        return followers
+
+    def test_concurrent_follow_clicks(self):
+        follow = reverse('posts:profile_follow', args=['raceauthor'])
+        self.hammer(lambda reader: [follow] * self.rounds)
+        self.assertEqual(self.assertConsistent(), self.threads)
+
+    def test_concurrent_follow_and_unfollow(self):
+        follow = reverse('posts:profile_follow', args=['raceauthor'])
+        unfollow = reverse('posts:profile_unfollow', args=['raceauthor'])
+
+        def urls(reader):
+            # Чётные читатели в итоге подписаны, нечётные — нет.
+            tail = [follow] if reader.username[-1] in '02468' else []
+            return [follow, follow, unfollow, unfollow] * self.rounds + tail
+
+        self.hammer(urls)
+        self.assertEqual(self.assertConsistent(), self.threads // 2)
+
+    def test_same_pair_follow_clicks(self):
+        # Один читатель жмёт «Подписаться» сразу из многих вкладок:
+        # вставки одной пары (user, author) гоняются за unique_list.
+        reader = self.readers[0]
+        follow = reverse('posts:profile_follow', args=['raceauthor'])
+        self.hammer(
+            lambda reader: [follow] * self.rounds, [reader] * self.threads
+        )
+        self.assertEqual(Follow.objects.filter(
+            user=reader, author=self.author).count(), 1)
+        self.assertEqual(self.assertConsistent(), 1)
+        self.assertEqual(UserStats.objects.get(user=reader).following_count, 1)
+
+    def test_same_pair_follow_and_unfollow(self):
+        reader = self.readers[0]
+        follow = reverse('posts:profile_follow', args=['raceauthor'])
+        unfollow = reverse('posts:profile_unfollow', args=['raceauthor'])
+        self.hammer(
+            lambda reader: [follow, unfollow] * self.rounds,
+            [reader] * self.threads
+        )
+        # Чья отписка последняя, неизвестно, но счётчики и лента
+        # совпадают с тем, что осталось в таблице подписок.
+        self.assertIn(self.assertConsistent(), (0, 1))
+        self.hammer(lambda reader: [follow], [reader] * self.threads)
+        self.assertEqual(self.assertConsistent(), 1)
@@ -1,11 +1,14 @@
 import shutil
 import tempfile
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from PIL import Image
 
 from posts.forms import PostForm
 from posts.models import Post, Group
@@ -97,3 +100,48 @@ class PostFormTests(TestCase):
         post.refresh_from_db()
         self.assertEqual(Post.objects.count(), posts_count)
         self.assertIn(new_text, post.text)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    POST_IMAGE_MAX_DIMENSION=100,
+    POST_IMAGE_MAX_UPLOAD_SIZE=200_000,
+)
+class PostImageNormalizationTests(TestCase):
+    def photo(self, size=(400, 300)):
+        exif = Image.Exif()
+        exif[0x0110] = 'Camera model'
+        # Orientation = 6: кадр снят повёрнутым на 90°.
+        exif[0x0112] = 6
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'JPEG', exif=exif)
+        return SimpleUploadedFile(
+            name='photo.jpeg',
+            content=buffer.getvalue(),
+            content_type='image/jpeg'
+        )
+
+    def test_image_is_downscaled_and_stripped(self):
+        form = PostForm(data={'text': 'Фото'}, files={'image': self.photo()})
+        self.assertTrue(form.is_valid(), form.errors)
+        image_file = form.cleaned_data['image']
+        self.assertEqual(image_file.name, 'photo.jpg')
+        with Image.open(image_file) as image:
+            self.assertEqual(image.size, (75, 100))
+            self.assertFalse(image.getexif())
+
+    def test_too_large_upload_is_rejected(self):
+        upload = self.photo()
+        upload.size = 300_000
+        form = PostForm(data={'text': 'Фото'}, files={'image': upload})
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1_000_000)
+    def test_too_many_pixels_is_rejected_before_decoding(self):
+        upload = self.photo(size=(1200, 1000))
+        with mock.patch.object(Image.Image, 'load') as load:
+            form = PostForm(data={'text': 'Фото'}, files={'image': upload})
+            self.assertFalse(form.is_valid())
+        self.assertIn('не больше 1 Мпикс', str(form.errors['image']))
+        self.assertFalse(load.called)
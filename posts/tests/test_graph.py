@@ -0,0 +1,79 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import graph
+from posts.models import Follow, User
+
+
+class FollowGraphTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='graphreader')
+        cls.authors = [
+            User.objects.create_user(username=f'graphauthor{count}')
+            for count in range(4)
+        ]
+        for author in cls.authors[:2]:
+            Follow.objects.create(user=cls.reader, author=author)
+        Follow.objects.create(user=cls.authors[0], author=cls.reader)
+        Follow.objects.create(user=cls.authors[3], author=cls.authors[1])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_is_following_is_one_batched_lookup(self):
+        ids = [author.id for author in self.authors]
+        with self.assertNumQueries(1):
+            answer = graph.is_following(self.reader, self.authors)
+        self.assertEqual(answer, dict(zip(ids, (True, True, False, False))))
+        with self.assertNumQueries(0):
+            self.assertEqual(graph.is_following(self.reader, ids), answer)
+
+    def test_guest_follows_nobody(self):
+        with self.assertNumQueries(0):
+            answer = graph.is_following(AnonymousUser(), self.authors[:1])
+        self.assertEqual(answer, {self.authors[0].id: False})
+
+    def test_lists_and_mutuals(self):
+        first, second = self.authors[:2]
+        self.assertEqual(
+            graph.following_ids(self.reader), sorted([first.id, second.id])
+        )
+        self.assertEqual(
+            graph.follower_ids(second),
+            sorted([self.reader.id, self.authors[3].id])
+        )
+        self.assertEqual(graph.mutual_ids(self.reader), [first.id])
+        with self.assertNumQueries(1):
+            found = graph.adjacency(graph.FOLLOWING, self.authors)
+        self.assertEqual(list(found[first.id]), [self.reader.id])
+        self.assertEqual(list(found[second.id]), [])
+
+    def test_follow_and_unfollow_invalidate(self):
+        client = Client()
+        client.force_login(self.reader)
+        author = self.authors[2]
+        self.assertFalse(graph.is_following(self.reader, [author])[author.id])
+        client.get(reverse('posts:profile_follow', args=[author.username]))
+        self.assertTrue(graph.is_following(self.reader, [author])[author.id])
+        self.assertIn(self.reader.id, graph.follower_ids(author))
+        client.get(reverse('posts:profile_unfollow', args=[author.username]))
+        self.assertFalse(graph.is_following(self.reader, [author])[author.id])
+        self.assertNotIn(self.reader.id, graph.follower_ids(author))
+
+    def test_profile_button_is_per_viewer(self):
+        # На второго автора подписан не только читатель, но и третий.
+        client = Client()
+        client.force_login(self.authors[2])
+        response = client.get(
+            reverse('posts:profile', args=[self.authors[1].username])
+        )
+        self.assertFalse(response.context['following'])
+        client.force_login(self.reader)
+        response = client.get(
+            reverse('posts:profile', args=[self.authors[1].username])
+        )
+        self.assertTrue(response.context['following'])
@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from posts.models import Post
+from posts.paginator import CursorPaginator
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='cursoruser')
+        for count in range(12):
+            Post.objects.create(author=cls.user, text=f'Пост {count}')
+        # Одинаковая дата у всех постов: порядок держится на id.
+        Post.objects.update(pub_date=timezone.now())
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )
+        )
+
+    def ids(self, page):
+        return [post.id for post in page]
+
+    def test_walk_forward_and_back(self):
+        paginator = CursorPaginator(Post.objects.all(), 5)
+        first = paginator.get_page()
+        self.assertEqual(self.ids(first), self.expected[:5])
+        self.assertFalse(first.has_previous())
+
+        second = paginator.get_page(first.next_cursor)
+        self.assertEqual(self.ids(second), self.expected[5:10])
+
+        third = paginator.get_page(second.next_cursor)
+        self.assertEqual(self.ids(third), self.expected[10:])
+        self.assertFalse(third.has_next())
+
+        back = paginator.get_page(third.previous_cursor)
+        self.assertEqual(self.ids(back), self.expected[5:10])
+        self.assertTrue(back.has_previous())
+
+        start = paginator.get_page(back.previous_cursor)
+        self.assertEqual(self.ids(start), self.expected[:5])
+        self.assertFalse(start.has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        paginator = CursorPaginator(Post.objects.all(), 5)
+        for cursor in ('garbage', 'W10', 'WyJuIixbInh4IiwiMSJdXQ'):
+            with self.subTest(cursor=cursor):
+                page = paginator.get_page(cursor)
+                self.assertEqual(self.ids(page), self.expected[:5])
+                self.assertEqual(page.cursor, '')
+        cursor = paginator.get_page().next_cursor
+        self.assertEqual(paginator.get_page(cursor).cursor, cursor)
+
+    def test_no_count_query(self):
+        paginator = CursorPaginator(Post.objects.all(), 5)
+        cursor = paginator.get_page().next_cursor
+        with self.assertNumQueries(0):
+            page = paginator.get_page(cursor)
+        with self.assertNumQueries(1):
+            list(page)
+            page.has_next()
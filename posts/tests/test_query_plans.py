@@ -0,0 +1,107 @@
+import re
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from posts.models import (
+    Comment, Follow, Group, Post, PostTrend, TimelineEntry
+)
+from posts.paginator import CursorPaginator
+
+User = get_user_model()
+
+
+class QueryPlanTests(TestCase):
+    """Запросы лент должны идти по индексам, без полного скана и
+    без сортировки во временной структуре."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='planauthor')
+        cls.reader = User.objects.create_user(username='planreader')
+        cls.group = Group.objects.create(
+            title='План', slug='plan', description='План запроса'
+        )
+        for count in range(30):
+            Post.objects.create(
+                author=cls.author, text=f'Пост {count}', group=cls.group
+            )
+        cls.post = Post.objects.first()
+        Comment.objects.create(post=cls.post, author=cls.reader, text='Ок')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def plan(self, queryset):
+        if connection.vendor == 'postgresql':
+            # На маленьких таблицах планировщик и так выберет seq scan.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def assertUsesIndexes(self, queryset, table):
+        plan = self.plan(queryset)
+        if connection.vendor == 'sqlite':
+            self.assertIsNone(
+                re.search(rf'SCAN {table}(?! USING)', plan), plan
+            )
+            self.assertNotIn('TEMP B-TREE', plan)
+        elif connection.vendor == 'postgresql':
+            self.assertNotIn(f'Seq Scan on {table}', plan)
+            self.assertIsNone(re.search(r'(?m)^\s*(->\s*)?Sort\b', plan), plan)
+        else:
+            raise unittest.SkipTest(
+                'Планы проверяются для SQLite и PostgreSQL'
+            )
+
+    def pages(self, queryset, ordering=('-pub_date', '-id')):
+        paginator = CursorPaginator(queryset, 5, ordering=ordering)
+        first = paginator.get_page()
+        values = [
+            paginator._field(name).to_python(
+                paginator._field(name).value_to_string(first[-1])
+            )
+            for name in paginator.fields
+        ]
+        yield queryset.order_by(*ordering)[:6]
+        yield queryset.filter(
+            paginator._seek(values, forward=True)
+        ).order_by(*ordering)[:6]
+
+    def test_feed_plans(self):
+        feeds = {
+            'index': Post.objects.for_feed(),
+            'group': Post.objects.for_feed().filter(group=self.group),
+            'profile': Post.objects.for_feed().filter(author=self.author),
+        }
+        for name, queryset in feeds.items():
+            for number, page in enumerate(self.pages(queryset)):
+                with self.subTest(feed=name, page=number):
+                    self.assertUsesIndexes(page, Post._meta.db_table)
+
+    def test_timeline_plan(self):
+        entries = TimelineEntry.objects.filter(user=self.reader)
+        for number, page in enumerate(
+            self.pages(entries, ordering=('-pub_date', '-post_id'))
+        ):
+            with self.subTest(page=number):
+                self.assertUsesIndexes(page, TimelineEntry._meta.db_table)
+
+    def test_trending_plan(self):
+        trends = PostTrend.objects.all()
+        for number, page in enumerate(
+            self.pages(trends, ordering=('-score', '-post_id'))
+        ):
+            with self.subTest(page=number):
+                self.assertUsesIndexes(page, PostTrend._meta.db_table)
+
+    def test_comments_plan(self):
+        comments = Comment.objects.filter(post=self.post).order_by(
+            'created', 'id'
+        )
+        self.assertUsesIndexes(comments, Comment._meta.db_table)
+
+    def test_followers_plan(self):
+        followers = Follow.objects.filter(author=self.author).values('user')
+        self.assertUsesIndexes(followers, Follow._meta.db_table)
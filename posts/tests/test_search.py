@@ -0,0 +1,101 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post
+from posts.search import search_post_ids
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='searchauthor', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Кулинария',
+            slug='cooking',
+            description='Рецепты',
+        )
+        cls.soup = Post.objects.create(
+            author=cls.author, text='Рецепт борща со сметаной',
+            group=cls.group
+        )
+        cls.novel = Post.objects.create(
+            author=cls.author, text='Война и мир, том первый'
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_search_matches_text_group_and_author(self):
+        cases = {
+            'борща': [self.soup.id],
+            'кулинария': [self.soup.id],
+            'толстой': [self.novel.id, self.soup.id],
+            'несуществующее': [],
+        }
+        for query, expected in cases.items():
+            with self.subTest(query=query):
+                self.assertCountEqual(search_post_ids(query), expected)
+
+    def test_text_match_ranks_above_author_match(self):
+        post = Post.objects.create(
+            author=self.author, text='Толстой написал много книг'
+        )
+        self.assertEqual(search_post_ids('толстой')[0], post.id)
+
+    def test_index_follows_edits_and_deletes(self):
+        soup = Post.objects.get(pk=self.soup.pk)
+        soup.text = 'Рецепт щей'
+        soup.save()
+        self.assertEqual(search_post_ids('борща'), [])
+        self.assertEqual(search_post_ids('щей'), [soup.id])
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Кухня'
+        group.save()
+        self.assertEqual(search_post_ids('кухня'), [soup.id])
+        soup.delete()
+        self.assertEqual(search_post_ids('щей'), [])
+
+    def test_query_syntax_is_escaped(self):
+        for query in ('"', 'AND OR', 'мир*', 'NEAR(война мир)'):
+            with self.subTest(query=query):
+                search_post_ids(query)
+
+    def test_search_view(self):
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'война'}
+        )
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertEqual(response.context['posts'], [self.novel])
+        self.assertContains(response, 'Война и мир')
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser(
+            username='searchadmin', password='pass'
+        )
+        self.guest_client.force_login(admin)
+        response = self.guest_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'сметаной'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.soup]
+        )
+
+    @override_settings(SEARCH_MAX_RESULTS=1)
+    def test_admin_search_is_not_capped(self):
+        admin = User.objects.create_superuser(
+            username='searchadmin', password='pass'
+        )
+        self.guest_client.force_login(admin)
+        self.assertEqual(len(search_post_ids('толстой')), 1)
+        response = self.guest_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'толстой'}
+        )
+        self.assertCountEqual(
+            response.context['cl'].result_list, [self.soup, self.novel]
+        )
@@ -0,0 +1,76 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, UserStats
+from posts.stats import get_stats
+
+User = get_user_model()
+
+
+class UserStatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='statsauthor')
+        cls.reader = User.objects.create_user(username='statsreader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        self.author = User.objects.get(pk=UserStatsTests.author.pk)
+        self.reader = User.objects.get(pk=UserStatsTests.reader.pk)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_missing_stats_are_counted_on_read(self):
+        UserStats.objects.all().delete()
+        self.assertFalse(UserStats.objects.filter(user=self.author).exists())
+        self.assertEqual(get_stats(self.author).post_count, 1)
+        self.assertTrue(UserStats.objects.filter(user=self.author).exists())
+
+    def test_counters_follow_writes(self):
+        get_stats(self.author)
+        get_stats(self.reader)
+        post = Post.objects.create(author=self.author, text='Ещё пост')
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertEqual(self.stats(self.author).post_count, 2)
+        self.assertEqual(self.stats(self.author).follower_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(self.stats(self.reader).comment_count, 1)
+
+        post.delete()
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertEqual(self.stats(self.author).post_count, 1)
+        self.assertEqual(self.stats(self.author).follower_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+        self.assertEqual(self.stats(self.reader).comment_count, 0)
+
+    def test_rebuild_command(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        get_stats(self.author)
+        UserStats.objects.filter(user=self.author).update(
+            post_count=100, follower_count=100
+        )
+        call_command('rebuild_user_stats', stdout=StringIO())
+        self.assertEqual(self.stats(self.author).post_count, 1)
+        self.assertEqual(self.stats(self.author).follower_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+
+    def test_profile_uses_stats(self):
+        get_stats(self.author)
+        response = self.reader_client.get(
+            reverse('posts:profile', args=[self.author.username])
+        )
+        self.assertEqual(response.context['count_post'], 1)
+        self.assertFalse(response.context['following'])
@@ -0,0 +1,95 @@
+import io
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import suggestions
+from posts.models import Follow, FollowSuggestion, Post, User
+from posts.stats import rebuild_stats
+
+
+class FollowSuggestionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        names = ('reader', 'friend1', 'friend2', 'quiet', 'active', 'known')
+        cls.users = {
+            name: User.objects.create_user(username=f'suggest{name}')
+            for name in names
+        }
+        edges = (
+            ('reader', 'friend1'), ('reader', 'friend2'),
+            ('reader', 'known'),
+            ('friend1', 'quiet'), ('friend2', 'quiet'),
+            ('friend1', 'active'),
+            ('friend1', 'known'), ('friend2', 'reader'),
+        )
+        for user, author in edges:
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author]
+            )
+        for count in range(suggestions.ACTIVITY_CAP):
+            Post.objects.create(author=cls.users['active'], text=f'{count}')
+        rebuild_stats()
+
+    def setUp(self):
+        cache.clear()
+
+    def suggested(self, name):
+        return {
+            row.author.username[len('suggest'):]: (row.overlap, row.score)
+            for row in FollowSuggestion.objects.filter(user=self.users[name])
+        }
+
+    def test_two_hop_candidates(self):
+        self.assertEqual(suggestions.rebuild(batch_size=2), 4)
+        # Себя и уже прочитанных не предлагаем; вес — общие подписки,
+        # умноженные на активность автора.
+        self.assertEqual(self.suggested('reader'), {
+            'quiet': (2, 2.0), 'active': (1, 2.0),
+        })
+        self.assertEqual(self.suggested('friend2'), {
+            'friend1': (1, 1.0), 'known': (1, 1.0),
+        })
+        suggestions.rebuild()
+        self.assertEqual(FollowSuggestion.objects.count(), 4)
+
+    def test_top_n_and_stale_rows(self):
+        suggestions.rebuild(top_n=1)
+        self.assertEqual(
+            FollowSuggestion.objects.filter(
+                user=self.users['reader']
+            ).count(), 1
+        )
+        Follow.objects.all().delete()
+        self.assertEqual(suggestions.rebuild(), 0)
+        self.assertFalse(FollowSuggestion.objects.exists())
+
+    @override_settings(SUGGESTION_HOP_LIMIT=2)
+    def test_busy_intermediaries_skipped(self):
+        suggestions.rebuild()
+        # friend1 подписан на троих и в расчёт не идёт.
+        self.assertEqual(self.suggested('reader'), {'quiet': (1, 1.0)})
+
+    def test_profile_shows_own_suggestions(self):
+        call_command('suggest_follows', stdout=io.StringIO())
+        client = Client()
+        client.force_login(self.users['reader'])
+        url = reverse('posts:profile', args=['suggestreader'])
+        with self.assertNumQueries(6):
+            response = client.get(url)
+        self.assertEqual(
+            [row.author.username for row in response.context['suggestions']],
+            ['suggestquiet', 'suggestactive']
+        )
+        self.assertContains(response, 'Кого почитать')
+        other = reverse('posts:profile', args=['suggestfriend1'])
+        self.assertEqual(client.get(other).context['suggestions'], [])
+        client.get(reverse('posts:profile_follow', args=['suggestquiet']))
+        response = client.get(url)
+        self.assertEqual(
+            [row.author.username for row in response.context['suggestions']],
+            ['suggestactive']
+        )
@@ -0,0 +1,96 @@
+import shutil
+import tempfile
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='thumbuser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def uploaded(self, name='thumb.gif'):
+        return SimpleUploadedFile(
+            name=name, content=SMALL_GIF, content_type='image/gif'
+        )
+
+    def test_feed_serves_placeholder_until_thumbnail_is_ready(self):
+        post = Post.objects.create(
+            author=self.user, text='С картинкой', image=self.uploaded()
+        )
+        response = self.client.get(reverse('posts:posts_list'))
+        self.assertContains(response, settings.THUMBNAIL_PLACEHOLDER)
+
+        thumbnails.generate(post.image.name)
+        response = self.client.get(reverse('posts:posts_list'))
+        self.assertNotContains(response, settings.THUMBNAIL_PLACEHOLDER)
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'type="image/webp"')
+        for width in settings.POST_IMAGE_WIDTHS:
+            self.assertContains(response, f' {width}w', count=2)
+
+    def test_upload_schedules_generation_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(
+                reverse('posts:post_create'),
+                data={'text': 'Новый пост', 'image': self.uploaded('new.gif')},
+            )
+        self.assertIn(
+            'schedule.<locals>.submit',
+            [callback.__qualname__ for callback in callbacks]
+        )
+
+    def test_failed_generation_is_not_rescheduled(self):
+        post = Post.objects.create(
+            author=self.user, text='Битая картинка',
+            image=SimpleUploadedFile(
+                name='broken.gif', content=b'not a gif',
+                content_type='image/gif'
+            )
+        )
+        # Как в пуле: _run закрывает соединения своего потока.
+        worker = threading.Thread(
+            target=thumbnails._run, args=(post.image.name, None)
+        )
+        with self.assertLogs('posts.thumbnails', 'ERROR'):
+            worker.start()
+            worker.join()
+        self.assertTrue(thumbnails.failed(post.image.name))
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.get(reverse('posts:posts_list'))
+        self.assertContains(response, settings.THUMBNAIL_PLACEHOLDER)
+        self.assertEqual(callbacks, [])
@@ -0,0 +1,146 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import transfer
+from posts.models import (
+    Follow, Group, GroupTrend, Post, PostTrend, TimelineEntry, User,
+    UserStats
+)
+from posts.search import search_post_ids
+from posts.stats import rebuild_stats
+
+
+class TransferTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='transferauthor')
+        cls.reader = User.objects.create_user(username='transferreader')
+        cls.group = Group.objects.create(
+            title='Перенос', slug='transfer', description='Импорт'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        rebuild_stats()
+
+    def setUp(self):
+        cache.clear()
+        handle, self.path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def write(self, *lines):
+        with open(self.path, 'w', encoding='utf-8') as stream:
+            for line in lines:
+                if not isinstance(line, str):
+                    line = json.dumps(line, ensure_ascii=False)
+                stream.write(line + '\n')
+
+    def load(self, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_posts', self.path, '--batch-size', '2', *args,
+                     stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_updates_derived_data(self):
+        self.client.force_login(self.reader)
+        self.client.get(reverse('posts:posts_list'))
+        self.write(
+            {'author': 'transferauthor', 'group': 'transfer',
+             'text': 'Импортированный пост про кофе',
+             'pub_date': '2022-07-01T12:00:00+00:00',
+             'image': 'posts/imported.jpg'},
+            {'author': 'transferauthor', 'text': 'Второй пост'},
+            {'author': 'transferauthor', 'group': None, 'text': 'Третий'},
+        )
+        out, err = self.load()
+        self.assertIn('Загружено постов: 3, пропущено строк: 0', out)
+        self.assertIn('строк/с', out)
+        post = Post.objects.get(text='Импортированный пост про кофе')
+        self.assertEqual(post.pub_date.year, 2022)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.image.name, 'posts/imported.jpg')
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).post_count, 3
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 3
+        )
+        self.assertEqual(search_post_ids('кофе'), [post.id])
+        self.assertEqual(PostTrend.objects.count(), 3)
+        self.assertTrue(GroupTrend.objects.filter(group=self.group).exists())
+        # Кэш лент сброшен, хотя сигналы не срабатывали.
+        response = self.client.get(reverse('posts:posts_list'))
+        self.assertContains(response, 'Третий')
+
+    def test_bad_lines_are_skipped(self):
+        self.write(
+            'не json',
+            '[1, 2]',
+            {'author': 'nobody', 'text': 'Чужой'},
+            {'author': 'transferauthor', 'group': 'nowhere', 'text': 'Нет'},
+            {'author': 'transferauthor', 'text': ''},
+            {'author': 'transferauthor', 'text': 'Дата', 'pub_date': 'вчера'},
+            {'author': ['transferauthor'], 'text': 'Список'},
+            '',
+            {'author': 'transferauthor', 'text': 'Годный'},
+        )
+        out, err = self.load('--max-errors', '3')
+        self.assertIn('Загружено постов: 1, пропущено строк: 7', out)
+        self.assertIn('Строка 1: не JSON', err)
+        self.assertIn('Строка 3: нет автора «nobody»', err)
+        self.assertNotIn('Строка 4', err)
+        self.assertEqual(Post.objects.get().text, 'Годный')
+
+    def test_create_missing(self):
+        self.write({'author': 'newcomer', 'group': 'fresh', 'text': 'Привет'})
+        self.load('--create-missing')
+        post = Post.objects.select_related('author', 'group').get()
+        self.assertEqual(post.author.username, 'newcomer')
+        self.assertFalse(post.author.has_usable_password())
+        self.assertEqual(post.group.slug, 'fresh')
+
+    def test_round_trip(self):
+        for count in range(5):
+            Post.objects.create(
+                author=self.author, text=f'Пост {count}',
+                group=self.group if count % 2 else None,
+            )
+        out = io.StringIO()
+        call_command('export_posts', '--batch-size', '2', stdout=out,
+                     stderr=io.StringIO())
+        exported = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(exported), 5)
+        self.assertEqual(exported[1]['group'], 'transfer')
+        self.assertIsNone(exported[0]['image'])
+        Post.objects.all().delete()
+        imported, skipped = transfer.import_posts(
+            out.getvalue().splitlines(), batch_size=2
+        )
+        self.assertEqual((imported, skipped), (5, 0))
+        self.assertEqual(
+            list(Post.objects.order_by('id').values_list('text', 'group')),
+            [(row['text'], self.group.id if row['group'] else None)
+             for row in exported]
+        )
+        out = io.StringIO()
+        call_command('export_posts', '--author', 'transferauthor',
+                     '--group', 'transfer', stdout=out, stderr=io.StringIO())
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+    def test_post_detail_after_import(self):
+        self.write({'author': 'transferauthor', 'text': 'Откройте меня'})
+        self.load()
+        post = Post.objects.get()
+        response = Client().get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id})
+        )
+        self.assertContains(response, 'Откройте меня')
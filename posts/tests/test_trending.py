@@ -0,0 +1,113 @@
+import io
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.queries import query_budget
+from posts import trending
+from posts.models import Comment, Group, GroupTrend, Post, PostTrend, User
+
+
+class TrendingScoreTests(TestCase):
+    def test_log_add(self):
+        self.assertAlmostEqual(trending._log_add(3, 3), 4)
+        self.assertAlmostEqual(trending._log_add(None, 5), 5)
+        # Большие показатели не переполняют float.
+        self.assertAlmostEqual(trending._log_add(5000, 0), 5000)
+
+    @override_settings(TRENDING_HALF_LIFE_HOURS=10)
+    def test_decay(self):
+        now = timezone.now()
+        fresh = trending._log_weight(1, now)
+        old = trending._log_weight(1, now - timedelta(hours=10))
+        self.assertAlmostEqual(fresh - old, 1)
+        self.assertAlmostEqual(
+            trending._log_weight(2, now - timedelta(hours=10)), fresh
+        )
+
+
+class TrendingFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='trendauthor')
+        cls.reader = User.objects.create_user(username='trendreader')
+        cls.quiet_group = Group.objects.create(
+            title='Тихая', slug='quiet', description='Без обсуждений'
+        )
+        cls.hot_group = Group.objects.create(
+            title='Горячая', slug='hot', description='Обсуждают'
+        )
+        cls.older = Post.objects.create(
+            author=cls.author, text='Старый пост', group=cls.hot_group
+        )
+        cls.newer = Post.objects.create(
+            author=cls.author, text='Новый пост', group=cls.quiet_group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed(self):
+        response = self.client.get(reverse('posts:trending'))
+        return [post.text for post in response.context['page_obj']]
+
+    def comment(self, post, count=1):
+        for _ in range(count):
+            self.client.post(
+                reverse('posts:add_comment', kwargs={'post_id': post.id}),
+                data={'text': 'Обсуждаем'}
+            )
+
+    def test_comments_raise_post(self):
+        self.assertEqual(self.feed(), ['Новый пост', 'Старый пост'])
+        before = PostTrend.objects.get(post=self.older).score
+        self.comment(self.older, 3)
+        self.assertGreater(PostTrend.objects.get(post=self.older).score,
+                           before)
+        self.assertEqual(self.feed(), ['Старый пост', 'Новый пост'])
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(
+            [trend.group for trend in response.context['groups']],
+            [self.hot_group, self.quiet_group]
+        )
+
+    def test_rebuild_matches_incremental(self):
+        self.comment(self.older, 2)
+        self.comment(self.newer)
+        incremental = dict(PostTrend.objects.values_list('post', 'score'))
+        groups = dict(GroupTrend.objects.values_list('group', 'score'))
+        self.assertEqual(trending.rebuild(batch_size=1), 2)
+        for post_id, score in PostTrend.objects.values_list('post', 'score'):
+            self.assertAlmostEqual(score, incremental[post_id])
+        for group_id, score in GroupTrend.objects.values_list(
+            'group', 'score'
+        ):
+            self.assertAlmostEqual(score, groups[group_id])
+
+    def test_rebuild_command_backfills_missing_rows(self):
+        self.comment(self.older)
+        expected = dict(PostTrend.objects.values_list('post', 'score'))
+        PostTrend.objects.all().delete()
+        GroupTrend.objects.all().delete()
+        out = io.StringIO()
+        call_command('rebuild_trending', stdout=out)
+        self.assertIn('Пересчитаны веса 2 постов', out.getvalue())
+        for post_id, score in PostTrend.objects.values_list('post', 'score'):
+            self.assertAlmostEqual(score, expected[post_id])
+        self.assertTrue(GroupTrend.objects.exists())
+
+    def test_comment_without_trend_row(self):
+        PostTrend.objects.filter(post=self.newer).delete()
+        Comment.objects.create(post=self.newer, author=self.reader, text='!')
+        self.assertTrue(PostTrend.objects.filter(post=self.newer).exists())
+
+    @query_budget(5, max_repeats=1)
+    def test_query_budget(self):
+        self.assertEqual(len(self.feed()), 2)
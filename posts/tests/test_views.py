@@ -1,10 +1,20 @@
+import asyncio
+import threading
+
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import (
+    AsyncClient, Client, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from core.queries import query_budget
 from posts.models import Post, Group, Comment, Follow
+from posts.views import COMMENTS_PER_PAGE, read_only
 
 User = get_user_model()
 
@@ -162,6 +172,7 @@ class PaginatorViewsTest(TestCase):
             )
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.user = PaginatorViewsTest.user
 
@@ -181,20 +192,24 @@ class PaginatorViewsTest(TestCase):
     def test_second_pages(self):
         post = PaginatorViewsTest.post
         pages_count = {
-            reverse('posts:posts_list') + '?page=2': 5,
+            reverse('posts:posts_list'): 5,
             reverse(
                 'posts:group_list',
                 kwargs={'slug': 'test_groups'}
-            ) + '?page=2': 5,
+            ): 5,
             reverse(
                 'posts:profile',
                 kwargs={'username': post.author}
-            ) + '?page=2': 5,
+            ): 5,
         }
 
         for reverse_page, count in pages_count.items():
             with self.subTest(reverse_page=reverse_page):
-                response = self.guest_client.get(reverse_page)
+                first_page = self.guest_client.get(reverse_page)
+                cursor = first_page.context['page_obj'].next_cursor
+                response = self.guest_client.get(
+                    reverse_page, {'cursor': cursor}
+                )
                 self.assertEqual(len(response.context['page_obj']), count)
 
 
@@ -234,6 +249,143 @@ class CommentTests(TestCase):
         self.assertEqual(check.author, self.user)
 
 
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='threadauthor')
+        cls.post = Post.objects.create(author=cls.user, text='Обсуждение')
+        for count in range(COMMENTS_PER_PAGE + 5):
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Реплика {count}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id}
+        )
+        self.chunk_url = reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.id}
+        )
+
+    def texts(self, page):
+        return [comment.text for comment in page]
+
+    def test_first_page(self):
+        response = self.client.get(self.chunk_url)
+        page = response.context['comments']
+        self.assertEqual(len(page), COMMENTS_PER_PAGE)
+        self.assertEqual(page[0].text, 'Реплика 0')
+        self.assertContains(response, page.next_cursor)
+        response = self.client.get(self.chunk_url, {'order': 'new'})
+        self.assertEqual(
+            response.context['comments'][0].text,
+            f'Реплика {COMMENTS_PER_PAGE + 4}'
+        )
+
+    def test_load_more_html(self):
+        first = self.client.get(self.chunk_url).context['comments']
+        response = self.client.get(
+            self.chunk_url, {'cursor': first.next_cursor}
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comment_list.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(
+            self.texts(response.context['comments']),
+            [f'Реплика {count}' for count in range(COMMENTS_PER_PAGE,
+                                                     COMMENTS_PER_PAGE + 5)]
+        )
+        self.assertNotContains(response, 'Показать ещё')
+
+    def test_load_more_json(self):
+        response = self.client.get(
+            self.chunk_url, {'order': 'new', 'format': 'json'}
+        )
+        data = response.json()
+        self.assertEqual(len(data['results']), COMMENTS_PER_PAGE)
+        self.assertEqual(data['results'][0]['author'], 'threadauthor')
+        response = self.client.get(data['next'])
+        data = response.json()
+        self.assertIsNone(data['next'])
+        self.assertEqual(
+            [comment['text'] for comment in data['results']],
+            [f'Реплика {count}' for count in range(4, -1, -1)]
+        )
+
+    def test_missing_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, 404)
+        post = Post.objects.create(author=self.user, text='Без обсуждения')
+        url = reverse('posts:post_comments', kwargs={'post_id': post.id})
+        self.assertEqual(self.client.get(url).status_code, 200)
+        post.delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_detail_page_loads_comments_lazily(self):
+        response = self.client.get(self.detail_url)
+        self.assertNotIn('comments', response.context)
+        self.assertNotContains(response, 'Реплика 0')
+        self.assertContains(response, f'data-fragment="{self.chunk_url}')
+
+    def test_fragment_cached_until_new_comment(self):
+        self.client.get(self.chunk_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.chunk_url)
+        self.assertContains(response, 'Реплика 0')
+        self.assertEqual(response['Vary'], 'Accept')
+        json_response = self.client.get(
+            self.chunk_url, HTTP_ACCEPT='application/json'
+        )
+        self.assertEqual(json_response['Content-Type'], 'application/json')
+        self.assertNotEqual(json_response['ETag'], response['ETag'])
+        # Правка через update() не шлёт сигналов: фрагмент из кэша.
+        Comment.objects.filter(text='Реплика 0').update(text='Тихо')
+        self.assertContains(self.client.get(self.chunk_url), 'Реплика 0')
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': 'Новенький'}
+        )
+        response = self.client.get(self.chunk_url, {'order': 'new'})
+        self.assertContains(response, 'Новенький')
+        self.assertContains(self.client.get(self.chunk_url), 'Тихо')
+
+    def test_fragment_cache_ignores_unrelated_params(self):
+        def etag(**params):
+            return self.client.get(self.chunk_url, params)['ETag']
+
+        plain = etag()
+        for params in ({'utm_source': 'mail'}, {'x': '1', 'order': 'old'},
+                       {'cursor': 'мусор'}):
+            with self.subTest(params=params):
+                self.assertEqual(etag(**params), plain)
+        self.assertNotEqual(etag(order='new'), plain)
+        self.assertNotEqual(etag(format='json'), plain)
+
+    def test_detail_etag_survives_comments(self):
+        self.client.get(self.detail_url)
+        detail_etag = self.client.get(self.detail_url)['ETag']
+        chunk_etag = self.client.get(self.chunk_url)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Ещё одна'
+        )
+        response = self.client.get(
+            self.detail_url, HTTP_IF_NONE_MATCH=detail_etag
+        )
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            self.chunk_url, HTTP_IF_NONE_MATCH=chunk_etag
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            self.chunk_url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+
 class CashTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -247,20 +399,116 @@ class CashTests(TestCase):
         self.authorized_client.force_login(self.user)
 
     def test_cash_index(self):
-        response = self.authorized_client.get(reverse('posts:posts_list'))
-        cashe_text = 'Новый текст'
-        Post.objects.create(author=CashTests.user, text=cashe_text)
-        response = self.authorized_client.get(reverse('posts:posts_list'))
-        self.assertNotContains(response, cashe_text)
         cache.clear()
+        self.authorized_client.get(reverse('posts:posts_list'))
+        cashe_text = 'Новый текст'
+        post = Post.objects.create(author=CashTests.user, text=cashe_text)
         response = self.authorized_client.get(reverse('posts:posts_list'))
         self.assertContains(response, cashe_text)
-        Post.objects.filter(pk=1).delete()
+        # update() не шлёт сигналов: страница должна прийти из кэша.
+        Post.objects.filter(pk=post.pk).update(text='Тихая правка')
         response = self.authorized_client.get(reverse('posts:posts_list'))
         self.assertContains(response, cashe_text)
         cache.clear()
         response = self.authorized_client.get(reverse('posts:posts_list'))
-        self.assertNotContains(response, cashe_text)
+        self.assertContains(response, 'Тихая правка')
+        post.delete()
+        response = self.authorized_client.get(reverse('posts:posts_list'))
+        self.assertNotContains(response, 'Тихая правка')
+
+    def test_cash_post_card(self):
+        cache.clear()
+        edited = Post.objects.create(author=CashTests.user, text='Было')
+        untouched = Post.objects.create(author=CashTests.user, text='Как есть')
+        self.authorized_client.get(reverse('posts:posts_list'))
+        Post.objects.filter(pk=untouched.pk).update(text='Тихая правка')
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': edited.pk}),
+            data={'text': 'Стало'}
+        )
+        response = self.authorized_client.get(reverse('posts:posts_list'))
+        self.assertContains(response, 'Стало')
+        self.assertNotContains(response, 'Было')
+        self.assertContains(response, 'Как есть')
+
+    def test_cash_post_card_author_and_group(self):
+        cache.clear()
+        group = Group.objects.create(
+            title='Карточки', slug='oldslug', description='Описание'
+        )
+        Post.objects.create(author=CashTests.user, text='Пост', group=group)
+        self.authorized_client.get(reverse('posts:posts_list'))
+        self.user.first_name, self.user.last_name = 'Новое', 'Имя'
+        self.user.save()
+        group.slug = 'newslug'
+        group.save()
+        response = self.authorized_client.get(reverse('posts:posts_list'))
+        self.assertContains(response, 'Новое Имя')
+        self.assertContains(response, '/group/newslug/')
+        self.assertNotContains(response, '/group/oldslug/')
+
+    def test_rename_reaches_group_profile_and_comments(self):
+        cache.clear()
+        author = User.objects.create_user(username='renameme')
+        group = Group.objects.create(
+            title='Переименования', slug='g', description='Описание'
+        )
+        post = Post.objects.create(
+            author=author, text='Пост', group=group
+        )
+        Comment.objects.create(post=post, author=author, text='Реплика')
+        group_url = reverse('posts:group_list', kwargs={'slug': 'g'})
+        profile_url = reverse('posts:profile', kwargs={'username': author})
+        comments_url = reverse(
+            'posts:post_comments', kwargs={'post_id': post.pk}
+        )
+        for url in (group_url, profile_url, comments_url):
+            self.guest_client.get(url)
+        author.first_name, author.last_name = 'Новое', 'Имя'
+        author.username = 'renamed_cashuser'
+        author.save()
+        self.assertContains(self.guest_client.get(group_url), 'Новое Имя')
+        self.assertContains(
+            self.guest_client.get(comments_url), 'renamed_cashuser'
+        )
+        group.slug = 'g2'
+        group.save()
+        response = self.guest_client.get(
+            reverse('posts:profile', kwargs={'username': author})
+        )
+        self.assertContains(response, '/group/g2/')
+
+    def test_junk_cursor_does_not_grow_cache(self):
+        cache.clear()
+        Post.objects.create(author=CashTests.user, text='Курсор')
+        group = Group.objects.create(
+            title='Курсоры', slug='cursors', description='Описание'
+        )
+        urls = (
+            reverse('posts:posts_list'),
+            reverse('posts:group_list', kwargs={'slug': group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for url in urls:
+            self.guest_client.get(url)
+        entries = len(cache._cache)
+        for url in urls:
+            for junk in ('мусор', 'abc', 'e30'):
+                with self.subTest(url=url, cursor=junk):
+                    response = self.guest_client.get(url, {'cursor': junk})
+                    self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(cache._cache), entries)
+
+    def test_cash_post_detail_comments(self):
+        post = Post.objects.create(author=CashTests.user, text='Пост')
+        url = reverse('posts:post_comments', kwargs={'post_id': post.pk})
+        self.authorized_client.get(url)
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            data={'text': 'Свежий комментарий'}
+        )
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Свежий комментарий')
 
     def tearDown(self):
         cache.clear()
@@ -327,3 +575,317 @@ class FollowTests(TestCase):
         post = FollowTests.post
         response = self.user_unfollow_client.get(reverse('posts:follow_index'))
         self.assertNotContains(response, post.text)
+
+
+class FeedQueryCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.small_group = Group.objects.create(
+            title='Маленькая группа',
+            slug='small_group',
+            description='Один пост',
+        )
+        cls.big_group = Group.objects.create(
+            title='Большая группа',
+            slug='big_group',
+            description='Много постов',
+        )
+        cls.lonely = User.objects.create_user(
+            username='lonely', first_name='Одинокий', last_name='Автор'
+        )
+        Post.objects.create(
+            author=cls.lonely, text='Единственный пост', group=cls.small_group
+        )
+        cls.authors = []
+        for count in range(10):
+            author = User.objects.create_user(
+                username=f'author{count}',
+                first_name=f'Имя{count}',
+                last_name=f'Фамилия{count}',
+            )
+            cls.authors.append(author)
+            Post.objects.create(
+                author=author, text=f'Пост {count}', group=cls.big_group
+            )
+            Post.objects.create(
+                author=cls.authors[0], text=f'Ещё пост {count}',
+                group=cls.big_group
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), len(response.context['page_obj'])
+
+    def test_feed_queries_do_not_grow_with_page_size(self):
+        feeds = {
+            'group_list': (
+                reverse('posts:group_list', args=['small_group']),
+                reverse('posts:group_list', args=['big_group']),
+            ),
+            'profile': (
+                reverse('posts:profile', args=['lonely']),
+                reverse('posts:profile', args=['author0']),
+            ),
+        }
+        for name, (small_url, big_url) in feeds.items():
+            with self.subTest(feed=name):
+                small_queries, small_size = self.count_queries(small_url)
+                big_queries, big_size = self.count_queries(big_url)
+                self.assertLess(small_size, big_size)
+                self.assertEqual(small_queries, big_queries)
+
+    def test_follow_queries_do_not_grow_with_page_size(self):
+        Follow.objects.create(user=self.reader, author=self.lonely)
+        small_index = self.count_queries(reverse('posts:follow_index'))
+        for author in self.authors:
+            Follow.objects.create(user=self.reader, author=author)
+        big_index = self.count_queries(reverse('posts:follow_index'))
+        self.assertLess(small_index[1], big_index[1])
+        self.assertEqual(small_index[0], big_index[0])
+
+    def test_index_queries_do_not_grow_with_page_size(self):
+        url = reverse('posts:posts_list')
+        big_queries, big_size = self.count_queries(url)
+        cache.clear()
+        cursor = self.client.get(url).context['page_obj'].next_cursor
+        cursor = self.client.get(
+            url, {'cursor': cursor}
+        ).context['page_obj'].next_cursor
+        small_queries, small_size = self.count_queries(
+            f'{url}?cursor={cursor}'
+        )
+        self.assertEqual((big_size, small_size), (10, 1))
+        self.assertEqual(small_queries, big_queries)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='etagauthor')
+        cls.reader = User.objects.create_user(username='etagreader')
+        cls.group = Group.objects.create(
+            title='ETag', slug='etag', description='Условный GET'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост с ETag', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ConditionalGetTests.reader)
+        self.urls = (
+            reverse('posts:posts_list'),
+            reverse('posts:group_list', kwargs={'slug': 'etag'}),
+            reverse('posts:profile', kwargs={'username': 'etagauthor'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+
+    def revalidate(self, client, url):
+        # Первый ответ может выставить CSRF-куку, а она входит в ETag.
+        client.get(url)
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_are_not_modified(self):
+        for url in self.urls:
+            for client in (self.guest_client, self.authorized_client):
+                with self.subTest(url=url):
+                    response = self.revalidate(client, url)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertEqual(response.content, b'')
+
+    def test_not_modified_skips_feed_and_templates(self):
+        url = reverse('posts:posts_list')
+        etag = self.guest_client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.templates, [])
+
+    def test_changes_invalidate_etag(self):
+        changes = {
+            'new post': lambda: Post.objects.create(
+                author=self.author, text='Свежий', group=self.group
+            ),
+            'comment': lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Ок'
+            ),
+            'follow': lambda: Follow.objects.create(
+                user=self.reader, author=self.author
+            ),
+        }
+        pages = {
+            'new post': self.urls[:3],
+            'comment': (reverse(
+                'posts:post_comments', kwargs={'post_id': self.post.id}
+            ),),
+            'follow': self.urls[2:3],
+        }
+        for name, change in changes.items():
+            etags = {
+                url: self.authorized_client.get(url)['ETag']
+                for url in pages[name]
+            }
+            change()
+            for url, etag in etags.items():
+                with self.subTest(change=name, url=url):
+                    response = self.authorized_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                    self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user_and_cursor(self):
+        url = reverse('posts:posts_list')
+        guest = self.guest_client.get(url)['ETag']
+        reader = self.authorized_client.get(url)['ETag']
+        self.assertNotEqual(guest, reader)
+        response = self.guest_client.get(
+            url, {'cursor': 'abc'}, HTTP_IF_NONE_MATCH=guest
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'private', self.authorized_client.get(url)['Cache-Control']
+        )
+
+
+@override_settings(ASYNC_READS_THREAD_SENSITIVE=False)
+class AsyncViewsTests(TransactionTestCase):
+    """Страницы чтения — корутины и читают из пула потоков, как в работе.
+
+    Пул видит только закоммиченные строки, поэтому TransactionTestCase.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='asyncauthor')
+        self.group = Group.objects.create(
+            title='Async', slug='async', description='ASGI'
+        )
+        self.post = Post.objects.create(
+            author=self.author, text='Асинхронный пост', group=self.group
+        )
+
+    async def test_read_pages(self):
+        client = AsyncClient()
+        urls = (
+            reverse('posts:posts_list'),
+            reverse('posts:group_list', kwargs={'slug': 'async'}),
+            reverse('posts:profile', kwargs={'username': 'asyncauthor'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = await client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Асинхронный пост')
+        response = await client.get(reverse('posts:follow_index'))
+        self.assertRedirects(
+            response, '/auth/login/?next=/follow/',
+            fetch_redirect_response=False
+        )
+
+    async def test_missing_objects(self):
+        client = AsyncClient()
+        response = await client.get(
+            reverse('posts:profile', kwargs={'username': 'nobody'})
+        )
+        self.assertEqual(response.status_code, 404)
+        response = await client.get(
+            reverse('posts:post_detail', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_reads_do_not_share_one_thread(self):
+        # Два вызова встречаются у барьера, только если идут параллельно.
+        barrier = threading.Barrier(2, timeout=5)
+        await asyncio.gather(
+            read_only(barrier.wait)(), read_only(barrier.wait)()
+        )
+
+    def test_wsgi_requests_reuse_connections(self):
+        # Под WSGI у каждого запроса свой цикл событий; соединения
+        # потоков пула всё равно переживают запрос.
+        client = Client()
+        url = reverse('posts:posts_list')
+        self.assertEqual(client.get(url).status_code, 200)
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            opened.append(connection)
+
+        connection_created.connect(count)
+        try:
+            for _ in range(3):
+                cache.clear()
+                self.assertEqual(client.get(url).status_code, 200)
+        finally:
+            connection_created.disconnect(count)
+        self.assertEqual(opened, [])
+
+
+class QueryBudgetTests(TestCase):
+    """Страницы укладываются в бюджет запросов и не делают N+1."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='budgetreader')
+        cls.author = User.objects.create_user(username='budgetauthor')
+        cls.group = Group.objects.create(
+            title='Бюджет', slug='budget', description='Запросы'
+        )
+        for count in range(12):
+            Post.objects.create(
+                author=cls.author, text=f'Пост {count}', group=cls.group
+            )
+        cls.post = Post.objects.first()
+        for count in range(8):
+            commenter = User.objects.create_user(username=f'commenter{count}')
+            Comment.objects.create(
+                post=cls.post, author=commenter, text=f'Комментарий {count}'
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def get(self, name, **kwargs):
+        response = self.client.get(reverse(name, kwargs=kwargs))
+        self.assertEqual(response.status_code, 200)
+
+    @query_budget(3, max_repeats=1)
+    def test_index(self):
+        self.get('posts:posts_list')
+
+    @query_budget(4, max_repeats=1)
+    def test_group_list(self):
+        self.get('posts:group_list', slug='budget')
+
+    @query_budget(6, max_repeats=1)
+    def test_profile(self):
+        self.get('posts:profile', username='budgetauthor')
+
+    @query_budget(4, max_repeats=1)
+    def test_post_detail(self):
+        self.get('posts:post_detail', post_id=self.post.id)
+
+    @query_budget(2, max_repeats=1)
+    def test_post_comments(self):
+        self.get('posts:post_comments', post_id=self.post.id)
+
+    @query_budget(5, max_repeats=1)
+    def test_follow_index(self):
+        self.get('posts:follow_index')
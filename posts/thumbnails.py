@@ -0,0 +1,210 @@
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.templatetags.static import static
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import DummyImageFile, ImageFile
+
+from posts.cache import bump, post_namespaces
+from posts.models import Post
+
+
+logger = logging.getLogger(__name__)
+
+# Пропорции кадра в карточке поста.
+POST_IMAGE_RATIO = 339 / 960
+
+# Запасной формат для браузеров без WebP/AVIF.
+FALLBACK_FORMAT = 'JPEG'
+
+MIME_TYPES = {
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+FAILED_PREFIX = 'thumbnail-failed'
+
+
+class ThumbnailFailed(Exception):
+    """Исходник не открылся: sorl пишет это в лог и молча не режет."""
+
+
+class Placeholder(DummyImageFile):
+    """Заглушка, пока миниатюра готовится в фоне."""
+
+    @property
+    def url(self):
+        return static(settings.THUMBNAIL_PLACEHOLDER)
+
+
+class AsyncThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, который не режет картинки в запросе.
+
+    Готовая миниатюра берётся из key-value store, а если её ещё нет,
+    генерация уходит в пул потоков, и шаблон получает заглушку.
+    """
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        cached = self.lookup(file_, geometry_string, options)
+        if cached:
+            return cached
+        schedule(_name(file_), [(geometry_string, options)])
+        return Placeholder(geometry_string)
+
+    def lookup(self, file_, geometry_string, options):
+        """Ищет готовую миниатюру, не открывая исходник."""
+        source = ImageFile(file_)
+        options = dict(options)
+        # Те же умолчания, что и в ThumbnailBackend.get_thumbnail:
+        # от них зависит имя файла миниатюры.
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+    def generate(self, file_, geometry_string, **options):
+        """Синхронная генерация: вызывается только из фонового потока."""
+        super().get_thumbnail(file_, geometry_string, **options)
+        thumbnail = self.lookup(file_, geometry_string, options)
+        if not thumbnail:
+            raise ThumbnailFailed(f'{_name(file_)} at {geometry_string}')
+        return thumbnail
+
+
+def variant_geometry(width):
+    return f'{width}x{round(width * POST_IMAGE_RATIO)}'
+
+
+def post_image_specs():
+    """Все варианты картинки поста: ширины × форматы из настроек."""
+    formats = tuple(settings.POST_IMAGE_FORMATS) + (FALLBACK_FORMAT,)
+    return [
+        (variant_geometry(width),
+         {'crop': 'center', 'upscale': True, 'format': image_format})
+        for width in settings.POST_IMAGE_WIDTHS
+        for image_format in dict.fromkeys(formats)
+    ]
+
+
+def lookup_variants(file_):
+    """Готовые варианты по форматам: {'WEBP': [(ширина, url), ...]}.
+
+    Второе значение — есть ли недостающие варианты.
+    """
+    backend = default.backend
+    variants = {}
+    missing = False
+    for geometry_string, options in post_image_specs():
+        thumbnail = backend.lookup(file_, geometry_string, options)
+        if not thumbnail:
+            missing = True
+            continue
+        variants.setdefault(options['format'], []).append(
+            (thumbnail.width, thumbnail.url)
+        )
+    return variants, missing
+
+
+def _name(file_):
+    return getattr(file_, 'name', file_)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def generate(name, specs=None):
+    """Готовит миниатюры картинки и обновляет карточки её постов."""
+    backend = default.backend
+    for geometry_string, options in specs or post_image_specs():
+        backend.generate(name, geometry_string, **options)
+    posts = list(Post.objects.filter(image=name).only(
+        'id', 'author_id', 'group_id'
+    ))
+    if posts:
+        # Карточки закэшированы с заглушкой: новая дата изменения
+        # даёт им новый ключ.
+        Post.objects.filter(pk__in=[post.pk for post in posts]).update(
+            updated=timezone.now()
+        )
+        for post in posts:
+            bump(*post_namespaces(post))
+
+
+def _failed_key(name):
+    digest = hashlib.md5(name.encode(), usedforsecurity=False).hexdigest()
+    return f'{FAILED_PREFIX}:{digest}'
+
+
+def failed(name):
+    """Падала ли генерация для картинки за последние
+    THUMBNAIL_FAILURE_TIMEOUT секунд."""
+    return cache.get(_failed_key(name)) is not None
+
+
+def _run(name, specs):
+    try:
+        generate(name, specs)
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюры для %s', name)
+        # Иначе каждая отрисовка карточки снова ставила бы в очередь
+        # ту же заведомо падающую работу.
+        cache.set(
+            _failed_key(name), True, settings.THUMBNAIL_FAILURE_TIMEOUT
+        )
+    finally:
+        with _executor_lock:
+            _pending.discard(name)
+        close_old_connections()
+
+
+def schedule(name, specs=None):
+    """Ставит генерацию в очередь после коммита текущей транзакции.
+
+    Картинки, на которых генерация недавно упала, не ставятся.
+    """
+    if not name or failed(name):
+        return
+
+    def submit():
+        with _executor_lock:
+            if name in _pending:
+                return
+            _pending.add(name)
+        _get_executor().submit(_run, name, specs)
+
+    transaction.on_commit(submit)
+
+
+def schedule_post(post):
+    if post.image:
+        schedule(post.image.name)
@@ -0,0 +1,173 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from posts.models import Follow, Post, TimelineEntry, UserStats
+from posts.paginator import get_cursor_page
+from posts.stats import stats_for
+
+
+BATCH_SIZE = 1000
+
+
+def fanout_limit():
+    """Сколько подписчиков автор может иметь, чтобы раскладывать посты."""
+    return getattr(settings, 'TIMELINE_FANOUT_LIMIT', 1000)
+
+
+def is_celebrity(author_id):
+    return stats_for(author_id).follower_count > fanout_limit()
+
+
+def _bulk_insert(entries):
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def fan_out_post(post):
+    """Кладёт новый пост в ленты подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.id,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in followers.iterator()
+    )
+
+
+def fan_out_posts(post_ids):
+    """Раскладывает пачку постов, вставленных мимо сигналов, одним
+    INSERT ... SELECT."""
+    post_ids = list(post_ids)
+    if not post_ids:
+        return 0
+    marks = ', '.join(['%s'] * len(post_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TimelineEntry._meta.db_table} '
+            '(user_id, post_id, author_id, pub_date) '
+            'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+            f'FROM {Post._meta.db_table} p '
+            f'JOIN {Follow._meta.db_table} f ON f.author_id = p.author_id '
+            f'WHERE p.id IN ({marks}) '
+            'AND p.author_id NOT IN ('
+            f'SELECT user_id FROM {UserStats._meta.db_table} '
+            'WHERE follower_count > %s)',
+            [*post_ids, fanout_limit()]
+        )
+        return cursor.rowcount
+
+
+def add_author(user_id, author_id):
+    """Переносит посты автора в ленту нового подписчика."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('id', 'pub_date')
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def backfill_author(author_id):
+    """Раскладывает все посты автора по лентам всех его подписчиков."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TimelineEntry._meta.db_table} '
+            '(user_id, post_id, author_id, pub_date) '
+            'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+            f'FROM {Follow._meta.db_table} f '
+            f'JOIN {Post._meta.db_table} p ON p.author_id = f.author_id '
+            'WHERE f.author_id = %s ON CONFLICT DO NOTHING',
+            [author_id]
+        )
+        return cursor.rowcount
+
+
+def follower_left(author_id):
+    """Вызывается после уменьшения follower_count автора.
+
+    Посты, написанные, пока подписчиков было больше предела, не
+    раскладывались и подмешивались при чтении. Когда автор опускается
+    до предела, чтение берёт только TimelineEntry, поэтому эти посты
+    досыпаются в ленты. Счётчик сдвигается под блокировкой строки, так
+    что ровно на пределе его видит одна отписка.
+    """
+    if stats_for(author_id).follower_count == fanout_limit():
+        backfill_author(author_id)
+
+
+def remove_author(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+@transaction.atomic
+def rebuild():
+    """Собирает ленты подписок заново одним INSERT ... SELECT.
+
+    Счётчики подписчиков (UserStats) к этому моменту должны быть
+    актуальны: по ним отсекаются авторы, чьи посты не раскладываются.
+    """
+    TimelineEntry.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TimelineEntry._meta.db_table} '
+            '(user_id, post_id, author_id, pub_date) '
+            'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+            f'FROM {Follow._meta.db_table} f '
+            f'JOIN {Post._meta.db_table} p ON p.author_id = f.author_id '
+            'WHERE f.author_id NOT IN ('
+            f'SELECT user_id FROM {UserStats._meta.db_table} '
+            'WHERE follower_count > %s)',
+            [fanout_limit()]
+        )
+        return cursor.rowcount
+
+
+def celebrity_authors(user):
+    """Авторы из подписок, чьи посты не раскладываются по лентам."""
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__stats__follower_count__gt=fanout_limit(),
+        ).values_list('author_id', flat=True)
+    )
+
+
+def get_timeline_page(request, user, per_page):
+    """Страница ленты подписок.
+
+    Обычно это один проход по индексу (user, pub_date) в TimelineEntry.
+    Посты авторов с огромным числом подписчиков не раскладываются при
+    записи и подмешиваются при чтении.
+    """
+    celebrities = celebrity_authors(user)
+    if not celebrities:
+        entries = TimelineEntry.objects.filter(user=user).select_related(
+            'post__author', 'post__group'
+        )
+        return get_cursor_page(
+            request, entries, per_page,
+            ordering=('-pub_date', '-post_id'),
+            transform=lambda rows: [entry.post for entry in rows],
+        )
+    own = TimelineEntry.objects.filter(user=user).values('post_id')
+    posts = Post.objects.for_feed().filter(
+        Q(id__in=own) | Q(author_id__in=celebrities)
+    )
+    return get_cursor_page(request, posts, per_page)
@@ -0,0 +1,221 @@
+"""Выгрузка и загрузка постов в формате JSON Lines.
+
+Одна строка — один пост::
+
+    {"author": "leo", "group": "cats", "text": "...",
+     "pub_date": "2022-07-01T12:00:00+00:00", "image": "posts/cat.jpg"}
+
+group и image могут быть null, pub_date — отсутствовать (тогда
+берётся текущее время). image — путь внутри MEDIA_ROOT, сами файлы
+переносятся отдельно.
+
+Оба направления потоковые: выгрузка идёт итератором по таблице,
+загрузка читает строки генератором и пишет пачками через bulk_create,
+так что память не зависит от размера файла. bulk_create не шлёт
+сигналов, поэтому счётчики, ленты подписок, поиск, популярное и
+поколения кэша каждая пачка обновляет сама, в своей транзакции.
+"""
+import json
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import cache, search, stats, timeline, trending
+from posts.models import Group, Post, User
+from posts.seed import BATCH_SIZE, batches, explicit_dates
+
+
+# Сколько имён авторов и slug групп помнить между пачками.
+LOOKUP_CACHE_SIZE = 100000
+
+
+class InvalidRecord(Exception):
+    pass
+
+
+def export_posts(stream, queryset=None, batch_size=BATCH_SIZE,
+                 progress=None):
+    """Пишет посты в stream по одному JSON на строку; возвращает число."""
+    if queryset is None:
+        queryset = Post.objects.all()
+    rows = queryset.order_by('id').values_list(
+        'author__username', 'group__slug', 'text', 'pub_date', 'image'
+    ).iterator(chunk_size=batch_size)
+    total = 0
+    for author, group, text, pub_date, image in rows:
+        stream.write(json.dumps({
+            'author': author,
+            'group': group,
+            'text': text,
+            'pub_date': pub_date.isoformat(),
+            'image': image or None,
+        }, ensure_ascii=False) + '\n')
+        total += 1
+        if progress is not None and total % batch_size == 0:
+            progress(total)
+    if progress is not None:
+        progress(total)
+    return total
+
+
+def read_records(lines):
+    """(номер строки, словарь или InvalidRecord) для каждой непустой."""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            yield number, InvalidRecord(f'не JSON: {error}')
+            continue
+        if not isinstance(record, dict):
+            yield number, InvalidRecord('ожидался объект')
+            continue
+        yield number, record
+
+
+class Lookup:
+    """Кэш «имя -> id» для авторов или групп.
+
+    Недостающие имена пачки достаются одним запросом. Кэш
+    ограничен LOOKUP_CACHE_SIZE и при переполнении очищается.
+    """
+
+    def __init__(self, model, field, create=None):
+        self.model = model
+        self.field = field
+        self.create = create
+        self.ids = {}
+
+    def resolve(self, names):
+        missing = {name for name in names if name not in self.ids}
+        if not missing:
+            return
+        if len(self.ids) + len(missing) > LOOKUP_CACHE_SIZE:
+            self.ids.clear()
+        self.ids.update(self._query(missing))
+        missing -= self.ids.keys()
+        if missing and self.create is not None:
+            self.model.objects.bulk_create(
+                [self.create(name) for name in missing],
+                ignore_conflicts=True,
+            )
+            self.ids.update(self._query(missing))
+
+    def _query(self, names):
+        return self.model.objects.filter(
+            **{f'{self.field}__in': names}
+        ).values_list(self.field, 'id')
+
+    def get(self, name):
+        return self.ids.get(name)
+
+
+def _new_user(username):
+    return User(username=username, password=make_password(None))
+
+
+def _new_group(slug):
+    return Group(slug=slug, title=slug, description='')
+
+
+def _build(record, authors, groups, now):
+    text = record.get('text')
+    if not isinstance(text, str) or not text.strip():
+        raise InvalidRecord('нет текста')
+    author = record.get('author')
+    author_id = authors.get(author) if isinstance(author, str) else None
+    if author_id is None:
+        raise InvalidRecord(f'нет автора «{author}»')
+    group_id = None
+    group = record.get('group')
+    if group:
+        group_id = groups.get(group) if isinstance(group, str) else None
+        if group_id is None:
+            raise InvalidRecord(f'нет группы «{group}»')
+    pub_date = now
+    if record.get('pub_date'):
+        try:
+            pub_date = parse_datetime(record['pub_date'])
+        except (TypeError, ValueError):
+            pub_date = None
+        if pub_date is None:
+            raise InvalidRecord(f'плохая дата «{record["pub_date"]}»')
+        if timezone.is_naive(pub_date):
+            pub_date = timezone.make_aware(pub_date)
+    return Post(
+        text=text,
+        author_id=author_id,
+        group_id=group_id,
+        pub_date=pub_date,
+        updated=pub_date,
+        image=record.get('image') or '',
+    )
+
+
+@transaction.atomic
+def _save_batch(posts):
+    Post.objects.bulk_create(posts)
+    for author_id, count in Counter(
+        post.author_id for post in posts
+    ).items():
+        stats.bump(author_id, post_count=count)
+    post_ids = [post.id for post in posts]
+    timeline.fan_out_posts(post_ids)
+    search.index_posts(post_ids)
+    trending.record_posts(posts)
+    cache.bump('posts', *{
+        namespace
+        for post in posts
+        for namespace in (
+            f'profile:{post.author_id}',
+            f'group:{post.group_id}' if post.group_id else None,
+        )
+    })
+
+
+def import_posts(lines, batch_size=BATCH_SIZE, create_missing=False,
+                 progress=None, on_error=None):
+    """Загружает посты из строк JSON Lines.
+
+    Строки с ошибками пропускаются и передаются в on_error(номер,
+    текст). С create_missing незнакомые авторы (без пароля) и группы
+    создаются. Возвращает (загружено, пропущено).
+    """
+    authors = Lookup(User, 'username', _new_user if create_missing else None)
+    groups = Lookup(Group, 'slug', _new_group if create_missing else None)
+    imported = skipped = 0
+    for batch in batches(read_records(lines), batch_size):
+        records = [
+            (number, record) for number, record in batch
+            if not isinstance(record, InvalidRecord)
+        ]
+        authors.resolve({
+            record['author'] for _, record in records
+            if isinstance(record.get('author'), str)
+        })
+        groups.resolve({
+            record['group'] for _, record in records
+            if isinstance(record.get('group'), str)
+        })
+        now = timezone.now()
+        posts = []
+        for number, record in batch:
+            try:
+                if isinstance(record, InvalidRecord):
+                    raise record
+                posts.append(_build(record, authors, groups, now))
+            except InvalidRecord as error:
+                skipped += 1
+                if on_error is not None:
+                    on_error(number, str(error))
+        if posts:
+            with explicit_dates():
+                _save_batch(posts)
+        imported += len(posts)
+        if progress is not None:
+            progress(imported, skipped)
+    return imported, skipped
@@ -0,0 +1,179 @@
+"""Лента «Популярное»: посты и группы по затухающему весу.
+
+Каждое событие — новый пост (вес растёт с числом подписчиков автора)
+или комментарий (вес 1) — со временем теряет вес вдвое за каждые
+half_life() часов. Вес на момент now равен
+
+    sum(w_i * 2 ** ((t_i - now) / H)),
+
+и у всех постов множитель 2 ** (-now / H) общий. Поэтому хранится
+log2(sum(w_i * 2 ** ((t_i - EPOCH) / H))): порядок по нему совпадает
+с порядком по текущему весу и не меняется с течением времени. Событие
+прибавляется к весу одним обновлением строки, без пересчёта всех
+комментариев, а первая страница — проход по индексу (-score).
+"""
+import math
+from datetime import datetime, timezone
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from posts.models import Comment, GroupTrend, Post, PostTrend, UserStats
+from posts.paginator import get_cursor_page
+from posts.stats import stats_for
+
+
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+BATCH_SIZE = 1000
+
+
+def half_life():
+    """За сколько часов вес события падает вдвое."""
+    return getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 12)
+
+
+def _log_weight(weight, when):
+    hours = (when - EPOCH).total_seconds() / 3600
+    return math.log2(weight) + hours / half_life()
+
+
+def _log_add(first, second):
+    """log2(2 ** first + 2 ** second) без переполнения."""
+    if first is None:
+        return second
+    high, low = max(first, second), min(first, second)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def post_weight(follower_count):
+    """Вес самого поста: 1 плюс логарифм аудитории автора."""
+    return 1 + math.log2(1 + follower_count)
+
+
+def _add(model, pk, value):
+    row = model.objects.select_for_update().filter(pk=pk).first()
+    if row is None:
+        try:
+            with transaction.atomic():
+                model.objects.create(pk=pk, score=value)
+            return
+        except IntegrityError:
+            row = model.objects.select_for_update().get(pk=pk)
+    model.objects.filter(pk=pk).update(score=_log_add(row.score, value))
+
+
+@transaction.atomic
+def _record(post_id, group_id, value):
+    # Строка блокируется до конца транзакции: параллельные комментарии
+    # к одному посту складываются по очереди и не теряются.
+    _add(PostTrend, post_id, value)
+    if group_id:
+        _add(GroupTrend, group_id, value)
+
+
+def record_post(post):
+    followers = stats_for(post.author_id).follower_count
+    _record(
+        post.id, post.group_id,
+        _log_weight(post_weight(followers), post.pub_date)
+    )
+
+
+@transaction.atomic
+def record_posts(posts):
+    """Веса пачки новых постов, вставленных мимо сигналов.
+
+    Авторы без записи UserStats считаются авторами без подписчиков.
+    """
+    followers = dict(UserStats.objects.filter(
+        user__in={post.author_id for post in posts}
+    ).values_list('user_id', 'follower_count'))
+    trends = []
+    groups = {}
+    for post in posts:
+        score = _log_weight(
+            post_weight(followers.get(post.author_id, 0)), post.pub_date
+        )
+        trends.append(PostTrend(post_id=post.id, score=score))
+        if post.group_id:
+            groups[post.group_id] = _log_add(groups.get(post.group_id), score)
+    PostTrend.objects.bulk_create(trends)
+    for group_id, score in sorted(groups.items()):
+        _add(GroupTrend, group_id, score)
+
+
+def record_comment(comment):
+    """Добавляет комментарий к весу поста и его группы.
+
+    Удалённые комментарии не вычитаются: их вклад и так затухает.
+    """
+    if Comment.post.is_cached(comment):
+        group_id = comment.post.group_id
+    else:
+        group_id = Post.objects.filter(pk=comment.post_id).values_list(
+            'group_id', flat=True
+        ).first()
+    _record(comment.post_id, group_id, _log_weight(1, comment.created))
+
+
+@transaction.atomic
+def rebuild(batch_size=BATCH_SIZE, apps=None):
+    """Пересчитывает веса всех постов и групп с нуля.
+
+    Для данных, залитых мимо сигналов. Посты и комментарии читаются
+    потоками в порядке id поста, в памяти — только веса групп.
+    Счётчики подписчиков (UserStats) должны быть актуальны. apps —
+    реестр моделей миграции, если пересчёт идёт из неё.
+    """
+    apps = apps or global_apps
+    Post, Comment, PostTrend, GroupTrend = (
+        apps.get_model('posts', name)
+        for name in ('Post', 'Comment', 'PostTrend', 'GroupTrend')
+    )
+    PostTrend.objects.all().delete()
+    GroupTrend.objects.all().delete()
+    posts = Post.objects.order_by('id').values_list(
+        'id', 'group_id', 'pub_date', 'author__stats__follower_count'
+    )
+    comments = Comment.objects.order_by('post_id').values_list(
+        'post_id', 'created'
+    ).iterator()
+    comment = next(comments, None)
+    groups = {}
+    batch = []
+    total = 0
+    for post_id, group_id, pub_date, followers in posts.iterator():
+        score = _log_weight(post_weight(followers or 0), pub_date)
+        while comment is not None and comment[0] <= post_id:
+            if comment[0] == post_id:
+                score = _log_add(score, _log_weight(1, comment[1]))
+            comment = next(comments, None)
+        batch.append(PostTrend(post_id=post_id, score=score))
+        if group_id:
+            groups[group_id] = _log_add(groups.get(group_id), score)
+        if len(batch) >= batch_size:
+            PostTrend.objects.bulk_create(batch)
+            total += len(batch)
+            batch = []
+    PostTrend.objects.bulk_create(batch)
+    GroupTrend.objects.bulk_create(
+        GroupTrend(group_id=group_id, score=score)
+        for group_id, score in groups.items()
+    )
+    return total + len(batch)
+
+
+def get_trending_page(request, per_page):
+    trends = PostTrend.objects.select_related('post__author', 'post__group')
+    return get_cursor_page(
+        request, trends, per_page,
+        ordering=('-score', '-post_id'),
+        transform=lambda rows: [trend.post for trend in rows],
+    )
+
+
+def top_groups(limit=5):
+    return list(
+        GroupTrend.objects.select_related('group').order_by('-score')[:limit]
+    )
@@ -1,75 +1,346 @@
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.core.paginator import Paginator
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render, get_object_or_404
 from django.shortcuts import redirect
-from django.views.decorators.cache import cache_page
+from django.db import close_old_connections, transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
 
-from posts.models import Post, Group, User, Follow
+from posts import follows, graph, suggestions
+from posts.cache import (
+    cached_response, detail_namespaces, fragment_context, generation,
+    not_modified, page_etag, set_validators
+)
+from posts.models import Comment, Post, Group, User
 from posts.forms import PostForm, CommentForm
+from posts.paginator import (
+    CURSOR_PARAM, CursorPaginator, get_cursor_page
+)
+from posts.search import search_post_ids
+from posts.stats import get_stats
+from posts.thumbnails import schedule_post
+from posts.timeline import get_timeline_page
+from posts.trending import get_trending_page, top_groups
+
+
+# В Django 4.0 у ORM нет асинхронного API. Запросы к базе и кэшу и
+# рендер шаблонов (страницы лент ленивые и читаются прямо в шаблоне)
+# уходят в поток через sync_to_async. С thread_sensitive=True все они
+# шли бы в один общий поток процесса, и медленный запрос задерживал бы
+# остальные. Эти вызовы только читают, поэтому выполняются в пуле
+# потоков; у каждого потока своё соединение с базой.
+#
+# Пул свой и живёт весь процесс: пул цикла событий по умолчанию под
+# WSGI создаётся заново на каждый запрос (у каждого запроса свой
+# цикл), и каждая страница открывала бы новые соединения. Размер
+# пула — ASYNC_READS_WORKERS — ограничивает и число соединений
+# процесса.
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_READS_WORKERS,
+                thread_name_prefix='reads',
+            )
+        return _executor
+
+
+def read_only(func):
+    @functools.wraps(func)
+    def call(*args, **kwargs):
+        # Как на границе запроса: битое или старше CONN_MAX_AGE
+        # соединение потока пула заменяется новым.
+        close_old_connections()
+        return func(*args, **kwargs)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        # Данные TestCase не закоммичены и видны только соединению
+        # основного потока, поэтому такие тесты читают из него же.
+        if settings.ASYNC_READS_THREAD_SENSITIVE:
+            return await sync_to_async(func)(*args, **kwargs)
+        return await sync_to_async(
+            call, thread_sensitive=False, executor=_get_executor()
+        )(*args, **kwargs)
+    return wrapper
+
+
+arender = read_only(render)
+aget_object_or_404 = read_only(get_object_or_404)
+apage_etag = read_only(page_etag)
+afragment_context = read_only(fragment_context)
+
+COMMENTS_PER_PAGE = 20
+COMMENT_ORDERINGS = {
+    'old': ('created', 'id'),
+    'new': ('-created', '-id'),
+}
+
+
+def comments_order(request):
+    """Порядок из ``order``: old — сначала старые, new — новые."""
+    order = request.GET.get('order')
+    return order if order in COMMENT_ORDERINGS else 'old'
+
+
+def comments_context(request, post):
+    """Страница комментариев поста по курсору и ключ её фрагмента.
+
+    Авторы выбираются тем же запросом, что и комментарии.
+    """
+    order = comments_order(request)
+    comments = get_cursor_page(
+        request, post.comments.select_related('author'), COMMENTS_PER_PAGE,
+        ordering=COMMENT_ORDERINGS[order],
+    )
+    return {
+        'comments': comments,
+        'comments_order': order,
+        'comments_cursor': comments.cursor,
+        'comments_version': generation(f'comments:{post.id}'),
+    }
 
 
-@cache_page(20)
-def index(request):
-    posts = Post.objects.order_by('-pub_date')
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+def wants_json(request):
+    return (
+        request.GET.get('format') == 'json'
+        or request.headers.get('Accept', '').startswith('application/json')
+    )
+
+
+async def index(request):
+    etag = await apage_etag(request, 'posts')
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    posts = Post.objects.for_feed()
+    page_obj = get_cursor_page(request, posts, 10)
     context = {
         'page_obj': page_obj,
+        **await afragment_context('posts'),
     }
-    return render(request, 'posts/index.html', context)
+    response = await arender(request, 'posts/index.html', context)
+    return set_validators(request, response, etag)
 
 
-def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = Post.objects.filter(group=group).order_by('-pub_date')
-    paginator = Paginator(posts, 5)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+async def group_posts(request, slug):
+    group = await aget_object_or_404(Group, slug=slug)
+    etag = await apage_etag(request, f'group:{group.id}')
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    posts = Post.objects.for_feed().filter(group=group)
+    page_obj = get_cursor_page(request, posts, 5)
     context = {
         'group': group,
         'page_obj': page_obj,
+        **await afragment_context(f'group:{group.id}'),
     }
-    return render(request, 'posts/group_list.html', context)
+    response = await arender(request, 'posts/group_list.html', context)
+    return set_validators(request, response, etag)
 
 
-def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = Post.objects.filter(author=author).all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    count_post = post_list.count()
-    follower = Follow.objects.filter(user=author)
-    following = Follow.objects.filter(author=author)
+async def trending(request):
+    """Популярное: посты по затухающему весу комментариев и аудитории.
+
+    Веса меняются с каждым комментарием, поэтому лента не кэшируется
+    целиком; первая страница — проход по индексу весов.
+    """
+    page_obj = get_trending_page(request, 10)
+    context = {
+        'page_obj': page_obj,
+        'groups': await read_only(top_groups)(),
+        **await afragment_context(),
+    }
+    return await arender(request, 'posts/trending.html', context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    post_ids = search_post_ids(query) if query else []
+    paginator = Paginator(post_ids, 10)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    found = Post.objects.for_feed().in_bulk(page_obj.object_list)
+    posts = [found[pk] for pk in page_obj.object_list if pk in found]
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'posts': posts,
+        **fragment_context(),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@read_only
+def _profile_validators(request, author):
+    stats = get_stats(author)
+    following = graph.is_following(request.user, [author])[author.id]
+    # Счётчики и кнопка подписки меняются без сдвига поколений.
+    etag = page_etag(
+        request, f'profile:{author.id}',
+        'suggestions' if request.user == author else None,
+        extra=(stats.follower_count, stats.following_count,
+               stats.comment_count, following),
+    )
+    return stats, following, etag
+
+
+@read_only
+def _own_suggestions(request, author):
+    if request.user != author:
+        return []
+    found = suggestions.for_user(author)
+    # Подписки после пересчёта: уже прочитанных авторов не предлагаем.
+    followed = graph.is_following(request.user, [
+        suggestion.author_id for suggestion in found
+    ])
+    return [
+        suggestion for suggestion in found
+        if not followed[suggestion.author_id]
+    ]
+
+
+async def profile(request, username):
+    author = await aget_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    stats, following, etag = await _profile_validators(request, author)
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    post_list = Post.objects.for_feed().filter(author=author)
+    page_obj = get_cursor_page(request, post_list, 10)
     context = {
         'profile': author,
         'page_obj': page_obj,
-        'paginator': paginator,
-        'count_post': count_post,
-        'follower': follower,
-        'following': following
+        'stats': stats,
+        'count_post': stats.post_count,
+        'following': following,
+        'suggestions': await _own_suggestions(request, author),
+        **await afragment_context(f'profile:{author.id}'),
     }
-    return render(request, 'posts/profile.html', context)
+    response = await arender(request, 'posts/profile.html', context)
+    return set_validators(request, response, etag)
 
 
-def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    author = post.author
-    post_list = Post.objects.filter(author=author).all()
-    count_post = post_list.count()
+@read_only
+def _post_detail_validators(request, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
+    count_post = get_stats(post.author).post_count
+    # Комментарии грузятся отдельным фрагментом и в ETag не входят.
+    etag = page_etag(
+        request, *detail_namespaces(post), extra=(count_post,),
+    )
+    return post, count_post, etag
+
+
+async def post_detail(request, post_id):
+    post, count_post, etag = await _post_detail_validators(request, post_id)
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
     context = {
         'post': post,
         'count_post': count_post,
-        'comments': comments,
-        'form': form
+        'form': form,
+        'comments_order': comments_order(request),
+        **await afragment_context(*detail_namespaces(post)),
     }
-    return render(request, 'posts/post_detail.html', context)
+    response = await arender(request, 'posts/post_detail.html', context)
+    return set_validators(request, response, etag)
+
+
+def _comments_json(request, context):
+    page = context['comments']
+    next_url = None
+    if page.has_next():
+        next_url = request.build_absolute_uri(
+            f'?order={context["comments_order"]}'
+            f'&{CURSOR_PARAM}={page.next_cursor}&format=json'
+        )
+    return JsonResponse({
+        'next': next_url,
+        'results': [
+            {
+                'id': comment.id,
+                'author': comment.author.username,
+                'text': comment.text,
+                'created': comment.created.isoformat(),
+            }
+            for comment in page
+        ],
+    })
+
+
+def _comments_cache_key(request, as_json):
+    """Ключ фрагмента — только то, от чего зависит ответ.
+
+    Посторонние параметры (utm_* и т. п.) и битый курсор не порождают
+    новых записей в кэше. В JSON ссылка на следующую страницу
+    абсолютная, поэтому в ключ входят ещё схема и хост.
+    """
+    order = comments_order(request)
+    cursor = CursorPaginator(
+        Comment.objects.none(), COMMENTS_PER_PAGE,
+        ordering=COMMENT_ORDERINGS[order],
+    ).clean_cursor(request.GET.get(CURSOR_PARAM))
+    origin = request.build_absolute_uri('/') if as_json else ''
+    return f'{as_json}|{order}|{cursor}|{origin}'
+
+
+@read_only
+def _comments_fragment(request, post_id):
+    as_json = wants_json(request)
+
+    def build():
+        post = get_object_or_404(Post, pk=post_id)
+        context = {'post': post, **comments_context(request, post)}
+        if as_json:
+            return _comments_json(request, context)
+        return render(request, 'posts/includes/comment_list.html', context)
+
+    return cached_response(
+        f'comments:{post_id}', _comments_cache_key(request, as_json), build
+    )
+
+
+async def post_comments(request, post_id):
+    """Комментарии поста отдельным фрагментом, HTML или JSON.
+
+    Ответ кэшируется целиком под поколением comments:<id>, которое
+    сдвигают только новые и удалённые комментарии. Страница поста от
+    него не зависит и остаётся в кэше, пока пост обсуждают.
+    """
+    content, content_type, etag = await _comments_fragment(
+        request, post_id
+    )
+    response = not_modified(request, etag)
+    if response is None:
+        response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+    # Фрагмент одинаков для всех пользователей.
+    patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ('Accept',))
+    return response
 
 
 @login_required
+@transaction.atomic
 def post_create(request):
     groups = Group.objects.all()
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -82,6 +353,7 @@ def post_create(request):
     new_post = form.save(commit=False)
     new_post.author = request.user
     form.save()
+    schedule_post(new_post)
     return redirect('posts:profile', username=new_post.author)
 
 
@@ -98,7 +370,9 @@ def post_edit(request, post_id):
         instance=is_edit
     )
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            schedule_post(post)
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'form': form,
@@ -110,10 +384,10 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
@@ -123,43 +397,42 @@ def add_comment(request, post_id):
     context = {
         'profile': profile,
         'post': post,
-        'comments': comments,
-        'form': form
+        'form': form,
+        **comments_context(request, post),
+        **fragment_context(),
     }
     return render(request, 'posts/comments.html', context)
 
 
-@login_required
-def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 5)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+@read_only
+def _is_authenticated(request):
+    return request.user.is_authenticated
+
+
+async def follow_index(request):
+    # login_required в Django 4.0 не умеет оборачивать корутины.
+    if not await _is_authenticated(request):
+        return redirect_to_login(request.get_full_path())
+    page_obj = await read_only(get_timeline_page)(
+        request, request.user, 5
+    )
     context = {
         'page_obj': page_obj,
+        **await afragment_context(),
     }
-    return render(request, 'posts/follow.html', context)
+    return await arender(request, 'posts/follow.html', context)
 
 
 @login_required
 def profile_follow(request, username):
     # Подписаться на автора
-    follower = request.user
-    following = get_object_or_404(User, username=username)
-    if following == request.user:
-        return redirect('posts:profile', username=username)
-    author_list, created = Follow.objects.get_or_create(
-        user=follower,
-        author=following
-    )
+    author = get_object_or_404(User, username=username)
+    follows.follow(request.user, author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
-    follower = request.user
-    following = get_object_or_404(User, username=username)
-    author_list = Follow.objects.filter(user=follower, author=following)
-    if not username == follower.username and author_list:
-        author_list.delete()
+    author = get_object_or_404(User, username=username)
+    follows.unfollow(request.user, author)
     return redirect('posts:profile', username=username)
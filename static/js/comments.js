@@ -0,0 +1,36 @@
+// Комментарии приходят отдельным фрагментом: страница поста
+// кэшируется независимо от обсуждения. Кнопка «Показать ещё»
+// дописывает следующую порцию на место себя.
+function loadComments(url, replace) {
+  return fetch(url, {credentials: 'same-origin'})
+    .then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.statusText);
+      }
+      return response.text();
+    })
+    .then(function (html) {
+      replace.insertAdjacentHTML('beforebegin', html);
+      replace.remove();
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function () {
+  var thread = document.querySelector('#comments[data-fragment]');
+  if (thread) {
+    var placeholder = document.createElement('span');
+    thread.replaceChildren(placeholder);
+    loadComments(thread.dataset.fragment, placeholder);
+  }
+});
+
+document.addEventListener('click', function (event) {
+  var link = event.target.closest('a[data-load-more]');
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  loadComments(link.href, link).catch(function () {
+    window.location = link.href;
+  });
+});
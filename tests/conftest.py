@@ -1,4 +1,14 @@
+import pytest
+
+from core.runner import test_overrides
+
 pytest_plugins = [
     'fixtures.fixture_user',
     'fixtures.fixture_data',
-]
\ No newline at end of file
+]
+
+
+@pytest.fixture(autouse=True, scope='session')
+def yatube_test_settings():
+    with test_overrides():
+        yield
@@ -1,5 +1,7 @@
+from datetime import timedelta
 from pathlib import Path
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -25,6 +27,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'about.apps.AboutConfig',
     'core.apps.CoreConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -32,10 +35,12 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
-    'debug_toolbar',
+    'rest_framework',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.QueryInspectionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -43,13 +48,29 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
 
+# Debug toolbar нужен только при разработке.
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
+# Замеры запросов (core.metrics): заголовок Server-Timing и гистограммы
+# по именам URL на /metrics/. Выключенные метрики ничего не стоят.
+METRICS_ENABLED = bool(os.getenv('METRICS_ENABLED', default=''))
+METRICS_ALLOWED_IPS = INTERNAL_IPS
+
+# Поиск N+1 и медленных запросов (core.queries): одинаковые по форме
+# запросы, повторённые за HTTP-запрос от QUERY_REPEAT_THRESHOLD раз,
+# и запросы дольше SLOW_QUERY_MS пишутся в лог core.queries.
+QUERY_INSPECTION = bool(os.getenv('QUERY_INSPECTION', default=DEBUG))
+QUERY_REPEAT_THRESHOLD = 5
+SLOW_QUERY_MS = 100
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATE_DIR = os.path.join(BASE_DIR, 'templates')
@@ -86,7 +107,11 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT')
+        'PORT': os.getenv('DB_PORT'),
+        # Соединения живут дольше запроса: асинхронные view читают из
+        # постоянного пула потоков, и каждый поток держит своё
+        # (posts.views).
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=60)),
     }
 }
 
@@ -105,11 +130,41 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Кэш общий для всех воркеров: по умолчанию файловый, в продакшене —
+# например, CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# и CACHE_LOCATION=redis://host:6379/1.
+CACHE_BACKEND = os.getenv(
+    'CACHE_BACKEND',
+    default='django.core.cache.backends.filebased.FileBasedCache'
+)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            default=os.path.join(tempfile.gettempdir(), 'yatube_cache')
+        ),
     }
 }
+# Файловый и локальный кэши сами вытесняют записи сверх MAX_ENTRIES
+# (по умолчанию всего 300). Redis и Memcached этот параметр не
+# принимают: у них свой предел памяти.
+if CACHE_BACKEND.endswith(('FileBasedCache', 'LocMemCache')):
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', default=50000)),
+    }
+
+# Асинхронные view читают из пула потоков, а не из одного общего.
+ASYNC_READS_THREAD_SENSITIVE = False
+# Потоков в этом пуле, а значит, и соединений с базой на процесс.
+ASYNC_READS_WORKERS = 8
+
+# Тесты запускаются со своим кэшем и настройками (core.runner).
+TEST_RUNNER = 'core.runner.TestRunner'
+
+# Фрагменты страниц инвалидируются счётчиками поколений (posts.cache),
+# поэтому могут жить долго.
+FRAGMENT_CACHE_TIMEOUT = 60 * 60
 
 LANGUAGE_CODE = 'ru'
 
@@ -125,6 +180,16 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# Загрузки крупнее этого Django пишет на диск чанками, а не в память.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2 * 2 ** 20
+
+# Картинки постов нормализуются при загрузке (posts.images).
+POST_IMAGE_MAX_UPLOAD_SIZE = 25 * 2 ** 20
+POST_IMAGE_MAX_DIMENSION = 2560
+# Картинки больше этого числа пикселей не декодируются вовсе.
+POST_IMAGE_MAX_PIXELS = 80_000_000
+POST_IMAGE_QUALITY = 85
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = 'users:login'
@@ -135,3 +200,45 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# Авторы с большим числом подписчиков не раскладывают посты по лентам:
+# их посты подмешиваются в ленту подписок при чтении.
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Миниатюры режутся в фоновом пуле потоков, а не в запросе.
+THUMBNAIL_BACKEND = 'posts.thumbnails.AsyncThumbnailBackend'
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_PLACEHOLDER = 'img/placeholder.svg'
+# Сколько секунд не пытаться снова резать картинку, на которой
+# генерация упала: до тех пор выводится заглушка.
+THUMBNAIL_FAILURE_TIMEOUT = 15 * 60
+
+# Ширины и современные форматы картинок поста для srcset/<picture>;
+# JPEG добавляется всегда как запасной вариант.
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_FORMATS = ('WEBP',)
+
+# Полнотекстовый поиск (posts.search): словарь PostgreSQL и сколько
+# лучших результатов показывать.
+SEARCH_CONFIG = 'russian'
+SEARCH_MAX_RESULTS = 200
+
+# JSON API /api/v1/ (приложение api).
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': (
+        'rest_framework_simplejwt.authentication.JWTAuthentication',
+    ),
+    'DEFAULT_PERMISSION_CLASSES': (
+        'rest_framework.permissions.IsAuthenticatedOrReadOnly',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+}
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
+    'AUTH_HEADER_TYPES': ('Bearer',),
+}